@@ -24,6 +24,7 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import re
 
 COMMAND_RIGHT = b'B'
 COMMAND_LEFT = b'T'
@@ -34,12 +35,24 @@ COMMAND_ON = b'D'
 COMMAND_OFF = b'U'
 COMMAND_P = b'P'
 
+# Every command is a letter followed by its argument run. The run is
+# digits (a number value) and/or distance letters: 'a'-'y' are 1-25,
+# 'z' is 255 and '|a'-'|z' are 26-51. Anything else in the run is ignored.
+COMMAND_RE = re.compile(rb'[A-Z@]')
+SPLIT_RE = re.compile(rb'([A-Z@])')
+PLAIN_DISTANCE_RE = re.compile(rb'[a-y]+')
+
+CHUNK_SIZE = 1 << 20
+
 
 class EgvParser:
     def __init__(self):
         self.command = None
         self.distance = 0
         self.number_value = 0
+        # argument run -> value, the same runs repeat all through a file
+        self.distance_cache = {b'': 0}
+        self.number_cache = {b'': 0}
 
     @staticmethod
     def skip(read, byte, count):
@@ -59,6 +72,55 @@ class EgvParser:
         self.skip(file, b'%', 5)
 
     def parse(self, f):
+        """Yields [command, distance, number] for the rest of file f"""
+        for command, distance, number in self.parse_buffer(f.read()):
+            yield [command, distance, number]
+
+    def parse_buffer(self, buf):
+        """Yields (command, distance, number) tuples for a bytes like buffer"""
+        for commands, distances, numbers in self.tokenize(buf):
+            yield from zip(commands, distances, numbers)
+
+    def tokenize(self, buf, chunk_size=CHUNK_SIZE, with_args=False):
+        """Splits a buffer into parallel lists of commands, distances and numbers
+
+        Works through the buffer a chunk at a time, each chunk ends just before
+        a command letter. The split runs in the regex engine and every distinct
+        argument is decoded only once, so there is no Python work per byte.
+        With with_args the raw argument runs come back as a fourth list, speed
+        codes need them because their leading zeros are significant.
+        """
+        distance_of = self.distance_cache
+        number_of = self.number_cache
+        start = 0
+        n = len(buf)
+        while start < n:
+            end = start + chunk_size
+            if end < n:
+                m = COMMAND_RE.search(buf, end)
+                end = m.start() if m is not None else n
+            else:
+                end = n
+            parts = SPLIT_RE.split(buf[start:end])
+            start = end
+            # parts[0] is anything before the first command
+            commands = parts[1::2]
+            args = parts[2::2]
+            try:
+                distances = list(map(distance_of.__getitem__, args))
+            except KeyError:
+                for arg in set(args):
+                    if arg not in distance_of:
+                        distance_of[arg], number_of[arg] = decode_argument(arg)
+                distances = list(map(distance_of.__getitem__, args))
+            numbers = list(map(number_of.__getitem__, args))
+            if with_args:
+                yield commands, distances, numbers, args
+            else:
+                yield commands, distances, numbers
+
+    def parse_stream(self, f):
+        """Byte at a time parser, for streams that can not be read at once"""
         while True:
             byte = f.read(1)
             if byte is None or len(byte) == 0:
@@ -96,6 +158,33 @@ class EgvParser:
         self.distance += amount
 
 
+def decode_argument(arg):
+    """Returns (distance, number) for the bytes that follow a command"""
+    if arg.isdigit():
+        return 0, int(arg)
+    if PLAIN_DISTANCE_RE.fullmatch(arg):
+        return sum(arg) - len(arg) * (ord('a') - 1), 0
+    distance = 0
+    number = 0
+    i = 0
+    n = len(arg)
+    while i < n:
+        value = arg[i]
+        i += 1
+        if ord('0') <= value <= ord('9'):
+            number = number * 10 + value - ord('0')
+        elif ord('a') <= value <= ord('y'):
+            distance += value - ord('a') + 1
+        elif value == ord('z'):
+            distance += 255
+        elif value == ord('|'):
+            if i >= n:
+                break
+            distance += 25 + arg[i] - ord('a') + 1
+            i += 1
+    return distance, number
+
+
 def parse_egv(f, plotter, properties=None):
     egv_parser = EgvParser()
     if isinstance(f, str):
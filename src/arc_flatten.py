@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+'''
+Arc flattening shared by the G-code and DXF readers
+
+Copyright (C) 2025 whodafloater
+
+MIT license
+
+An arc of radius R cut into chords of angle a is off the true curve
+by at most the sagitta R*(1 - cos(a/2)). The step angle is picked so
+the sagitta stays under the tolerance, so big arcs and small arcs come
+out equally smooth and no finer than needed.
+
+The points are made in one pass over the step angles and handed back
+as a flat array('d') of x,y pairs.
+'''
+
+from array import array
+from math import acos, atan, atan2, ceil, cos, pi, sin, sqrt, tan
+
+
+def arc_steps(radius, sweep, tol, min_steps=1):
+    '''Number of chords that keeps an arc of sweep radians within tol'''
+    if tol < radius:
+        step = 2*acos((radius-tol)/radius)
+    else:
+        step = pi/4
+    # the small nudge keeps round off from adding a chord
+    return max(int(ceil(abs(sweep)/step - 1e-9)), min_steps)
+
+
+def arc_sweep(x0, y0, x1, y1, cx, cy, ccw):
+    '''Radius, start angle and sweep of a G2/G3 style arc
+
+    The arc runs from x0,y0 to x1,y1 around cx,cy, counter clockwise
+    when ccw is set. The sweep is negative for clockwise arcs, and
+    matching end points make a full circle.
+    '''
+    start = atan2(y0-cy, x0-cx)
+    end   = atan2(y1-cy, x1-cx)
+    if ccw:
+        sweep = (end-start) % (2*pi)
+    else:
+        sweep = (start-end) % (2*pi)
+    if sweep <= 1e-9:
+        sweep = 2*pi
+    if not ccw:
+        sweep = -sweep
+    return sqrt((x0-cx)**2 + (y0-cy)**2), start, sweep
+
+
+def arc_points(cx, cy, radius, start, sweep, steps):
+    '''Points after the start of an arc, as x,y pairs in an array('d')
+
+    Angles are in radians, a negative sweep goes clockwise.
+    '''
+    d = sweep/steps
+    angles = [start + d*i for i in range(1, steps+1)]
+    pts = array('d', bytes(16*steps))
+    pts[0::2] = array('d', [cx + radius*cos(a) for a in angles])
+    pts[1::2] = array('d', [cy + radius*sin(a) for a in angles])
+    return pts
+
+
+def bulge_arc(x0, y0, x1, y1, bulge):
+    '''Centre, radius, start angle and sweep of a DXF bulge segment
+
+    The bulge is the tangent of a quarter of the included angle,
+    positive bulges go counter clockwise.
+    '''
+    dx = x1-x0
+    dy = y1-y0
+    c = sqrt(dx**2 + dy**2)
+    half = 2.0*atan(bulge)
+    # distance from the middle of the chord to the centre, to the left
+    L = c/(2.0*tan(half))
+    cx = (x0+x1)/2.0 - dy/c*L
+    cy = (y0+y1)/2.0 + dx/c*L
+    R = c/(2.0*abs(sin(half)))
+    return cx, cy, R, atan2(y0-cy, x0-cx), 2.0*half
@@ -18,6 +18,12 @@
 
 """
 from math import *
+from array import array
+from itertools import chain, compress
+import operator
+from bisect import bisect_right
+from stage_timer import TIMER, timed
+from arc_flatten import arc_steps, arc_points, bulge_arc
 Zero       = 0.00001
 
 ####################################################
@@ -51,8 +57,18 @@ class NURBSClass:
                                   Knots=self.Knots,\
                                   CPts=self.HCPts)
 
+        #Polynomial pieces for the fast point evaluator
+        self.Segments=self.power_segments()
+
     #Calculate a number points using error limiting
     def calc_curve(self,n=0, lin_tol=.001):
+        if n==0 and self.Segments!=None:
+            evaluate=self.point
+        else:
+            def evaluate(u):
+                Pt=self.NURBS_evaluate(n=n,u=u)
+                return Pt.x,Pt.y
+
         #Initial values for step and u
         u=0; Points=[]
         i=1
@@ -60,32 +76,114 @@ class NURBSClass:
             i=i+1
         step=self.Knots[i]/3
 
-        Pt1=self.NURBS_evaluate(n=n,u=0.0)
-        Points.append(Pt1)
+        x1,y1=evaluate(0.0)
+        Points.append(PointClass(x1,y1))
         while u<self.Knots[-1]:
             if (u+step > self.Knots[-1]):
                 step = self.Knots[-1]-u
 
-            Pt2=self.NURBS_evaluate(n=n,u=u+step)
-            Pt_test=self.NURBS_evaluate(n=n,u=u + step/2)
+            x2,y2=evaluate(u+step)
+            xt,yt=evaluate(u + step/2)
 
             ###
-            DX = Pt2.x-Pt1.x
-            DY = Pt2.y-Pt1.y
-            cord = sqrt(DX*DX + DY*DY)
-            DXtest = Pt_test.x-(Pt1.x+Pt2.x)/2.0
-            DYtest = Pt_test.y-(Pt1.y+Pt2.y)/2.0
+            DXtest = xt-(x1+x2)/2.0
+            DYtest = yt-(y1+y2)/2.0
             t = sqrt(DXtest*DXtest + DYtest*DYtest)
 
             if t > lin_tol:
                 step = step/2
             else:
                 u+=step
-                Points.append(Pt2)
+                Points.append(PointClass(x2,y2))
                 step = step*2
-                Pt1=Pt2
+                x1,y1=x2,y2
         return Points
 
+    #Fast evaluator for the curve points (no derivatives). The spline is
+    #cut into one rational Bezier piece per knot span (Algorithm A5.6
+    #from "THE NURBS BOOK" pg.173) and each piece is turned into power
+    #form, so a point is three Horner sums instead of a run through the
+    #basis function recursion. Returns None, and the basis functions
+    #stay in use, when the knot vector is not clamped.
+    def power_segments(self):
+        p=self.degree
+        U=self.Knots
+        Pw=self.HCPts
+        m=len(U)-1
+        if p<1 or U[0]==U[-1]:
+            return None
+        if U[:p+1]!=[U[0]]*(p+1) or U[-p-1:]!=[U[-1]]*(p+1):
+            return None
+        if U[p+1]==U[0] or U[-p-2]==U[-1]:
+            return None
+
+        a=p; b=p+1
+        Q=[[P[:] for P in Pw[:p+1]]]
+        starts=[U[a]]
+        while b<m:
+            i=b
+            while b<m and U[b+1]==U[b]:
+                b=b+1
+            mult=b-i+1
+            if mult>p and b<m:
+                return None
+            nxt=[[0.0,0.0,0.0] for k in range(p+1)]
+            if mult<p:
+                #Knot insertion up to multiplicity p
+                numer=U[b]-U[a]
+                alphas=[0.0]*(p+1)
+                for j in range(p,mult,-1):
+                    alphas[j-mult-1]=numer/(U[a+j]-U[a])
+                r=p-mult
+                Qb=Q[-1]
+                for j in range(1,r+1):
+                    save=r-j
+                    s=mult+j
+                    for k in range(p,s-1,-1):
+                        alpha=alphas[k-s]
+                        Qb[k]=[alpha*Qb[k][c]+(1.0-alpha)*Qb[k-1][c] for c in range(3)]
+                    if b<m:
+                        nxt[save]=Qb[p][:]
+            if b<m:
+                for i in range(p-mult,p+1):
+                    nxt[i]=Pw[b-p+i][:]
+                Q.append(nxt)
+                starts.append(U[b])
+                a=b; b=b+1
+        starts.append(U[m])
+
+        #Bezier to power form, a_k = C(p,k) sum_i (-1)^(k-i) C(k,i) B_i
+        segments=[]
+        for B in Q:
+            coef=[]
+            for k in range(p+1):
+                a_k=[0.0,0.0,0.0]
+                for i in range(k+1):
+                    f=comb(p,k)*comb(k,i)*(-1)**(k-i)
+                    for c in range(3):
+                        a_k[c]+=f*B[i][c]
+                coef.append(a_k)
+            coef.reverse()
+            segments.append(coef)
+        self.Starts=starts
+        return segments
+
+    #Calculate a point of the NURBS from the power form pieces
+    def point(self,u):
+        starts=self.Starts
+        k=bisect_right(starts,u)-1
+        if k<0:
+            k=0
+        elif k>=len(self.Segments):
+            k=len(self.Segments)-1
+        t=(u-starts[k])/(starts[k+1]-starts[k])
+        X=Y=W=0.0
+        for cx,cy,cw in self.Segments[k]:
+            X=X*t+cx
+            Y=Y*t+cy
+            W=W*t+cw
+        return X/W,Y/W
+
 
     #Calculate a point of NURBS
     def NURBS_evaluate(self,n=0,u=0):
@@ -272,19 +370,35 @@ class Header:
     def new_val(self, val):
         self.last_var.update({ str(val[0]) : val[1] })
 
+# dict keys of the group codes
+GROUP_KEYS = [str(code) for code in range(1072)]
+
 class Entity:
+    # The group code pairs are kept as read. The data dict is built
+    # the first time it is asked for, so entities that are never
+    # evaluated (unused blocks, ignored types) cost only a list append
+    # per pair.
     def __init__(self, _type):
         self.type = _type
-        self.data = dict()
+        self.pairs = []
     def update(self, value):
-        key = str(value[0])
-        val = value[1]
-        if key in self.data:
-            if type(self.data[key]) != list:
-                self.data[key] = [self.data[key]]
-            self.data[key].append(val)
-        else:
-            self.data.update({key:val})
+        self.pairs.append(value)
+    def __getattr__(self, name):
+        # only called while self.data does not exist yet
+        if name != 'data':
+            raise AttributeError(name)
+        data = dict()
+        for code, val in self.pairs:
+            key = GROUP_KEYS[code] if 0 <= code < 1072 else str(code)
+            old = data.get(key, data)
+            if old is data:
+                data[key] = val
+            elif type(old) != list:
+                data[key] = [old, val]
+            else:
+                old.append(val)
+        self.data = data
+        return data
 
 class Entities:
     def __init__(self):
@@ -295,7 +409,7 @@ class Entities:
         self.entities.append(e)
         self.last = e
     def update(self, value):
-        self.last.update(value)
+        self.last.pairs.append(value)
 
 class Layer:
     def __init__(self):
@@ -356,13 +470,15 @@ class DXF_CLASS:
     def __init__(self):
         self.units = 0
         self.dxf_messages = ""
-        self.coords = []
-        self.cut_coords = []
-        self.eng_coords = []
+        # every segment as x0,y0,x1,y1 and a mask, 1 for engrave 0 for cut
+        self.segments = array('d')
+        self.engrave = array('b')
+        self.line_types = dict()
         strings = []
         floats = []
         ints = []
         self.layer_color=dict()
+        self.block_cache=dict()
 
         strings += list(range(0, 10))     #String (255 characters maximum; less for Unicode strings)
         floats += list(range(10, 60))     #Double precision 3D point
@@ -445,26 +561,36 @@ class DXF_CLASS:
 ###        fd.close()
 
     def read_dxf_data(self, fd, data):
+        data.extend(self.iter_dxf_data(fd))
+
+    def iter_dxf_data(self, fd):
+        # Yield (group_code, value) pairs as the file is read, nothing is
+        # held but the current pair. A pair that does not parse is dropped.
         self.comment="None"
-        Skip = True
+        self.n_group_codes = 0
+        funs = self.funs
         fd_iter = iter(fd)
+        Skip = True
         for line in fd_iter:
             try:
                 group_code = int(line)
-                value = next(fd_iter).replace('\r', '')
-                value = value.replace('\n', '')
-                value = value.lstrip(' ')
-                value = value.rstrip(' ')
-                value = self.funs[group_code](value)
-                if (value != "SECTION") and Skip:
+                value = next(fd_iter)
+                fun = funs[group_code]
+            except (ValueError, IndexError, StopIteration):
+                continue
+            try:
+                value = fun(value.strip(' \r\n'))
+            except ValueError:
+                continue
+            if Skip:
+                # everything before the first section is skipped
+                if value != "SECTION":
                     if group_code==999:
                         self.comment=value
                     continue
-                else:
-                    Skip = False
-                data.append((group_code, value))
-            except:
-                pass
+                Skip = False
+            self.n_group_codes += 1
+            yield group_code, value
 
     ##########################################################################
     # routine takes an sin and cos and returns the angle (between 0 and 360) #
@@ -486,56 +612,82 @@ class DXF_CLASS:
         return newx,newy
 
     def bulge_coords(self,x0,y0,x1,y1,bulge,lin_tol=.001):
-        global Zero
         bcoords=[]
-        if bulge < 0.0:
-            sign = 1
-            bulge=abs(bulge)
-        else:
-            sign = -1
-
-        dx      = x1-x0
-        dy      = y1-y0
-        c       = sqrt(dx**2 + dy**2)
-        alpha   = 2.0 * (atan(bulge))
-        R       = c / (2*sin(alpha))
-        L       = R * cos(alpha)
-
-        if (lin_tol < R):
-            step_deg = 2*acos((R-lin_tol)/R)*180/pi
-        else:
-            step_deg = 45
-        steps   = ceil(2*alpha / radians(step_deg))
-
-        if abs(c) < Zero:
-            phi = 0
+        if sqrt((x1-x0)**2 + (y1-y0)**2) < Zero:
             bcoords.append([x0,y0,x1,y1])
             return bcoords
 
-        seg_sin =  dy/c
-        seg_cos =  dx/c
-        phi = self.Get_Angle(seg_sin,seg_cos)
-
-        d_theta = 2*alpha / steps
-        theta = alpha - d_theta
+        cx, cy, R, start, sweep = bulge_arc(x0,y0,x1,y1,bulge)
+        steps = arc_steps(R, sweep, lin_tol)
+        pts = arc_points(cx, cy, R, start, sweep, steps)
+        pts[-2] = x1
+        pts[-1] = y1
 
         xa = x0
         ya = y0
-        for i in range(1,int(steps)):
-            xp = c/2 - R*sin(theta)
-            yp = R*cos(theta) - L
-            xb,yb = self.Transform(xp,yp*sign,radians(phi))
-            xb=xb+x0
-            yb=yb+y0
-
-            bcoords.append([xa,ya,xb,yb])
-            xa = xb
-            ya = yb
-            theta = theta -d_theta
-        bcoords.append([xa,ya,x1,y1])
+        for i in range(0,len(pts),2):
+            bcoords.append([xa,ya,pts[i],pts[i+1]])
+            xa = pts[i]
+            ya = pts[i+1]
         return bcoords
 
-    def add_coords(self,line,offset,scale,rotate,color=None,layer=None):
+    def arc_coords(self,x,y,r,start,end,lin_tol,offset,scale,rotate,color,layer):
+        # start and end in degrees, counter clockwise
+        if end < start:
+            end=end+360.0
+        sweep = radians(end-start)
+        steps = arc_steps(r, sweep, lin_tol, min_steps=2)
+        pts = arc_points(x, y, r, radians(start), sweep, steps)
+        x0 = x + r * cos(radians(start))
+        y0 = y + r * sin(radians(start))
+        for i in range(0,len(pts),2):
+            self.add_coords([x0,y0,pts[i],pts[i+1]],offset,scale,rotate,color,layer)
+            x0 = pts[i]
+            y0 = pts[i+1]
+
+    def block_coords(self,key,bl,lin_tol):
+        # A block is tessellated once per tolerance, in its own
+        # coordinates, and every INSERT of it reuses the result.
+        # Returns the block's segments, their engrave mask and the
+        # import messages the block made.
+        cache_key = (key, lin_tol)
+        if cache_key not in self.block_cache:
+            saved = self.segments, self.engrave, self.dxf_messages
+            self.segments = array('d')
+            self.engrave = array('b')
+            self.dxf_messages = ""
+            try:
+                for e in bl.blocks[key].entities:
+                    self.eval_entity(e,bl,lin_tol)
+                self.block_cache[cache_key] = (self.segments, self.engrave, self.dxf_messages)
+            finally:
+                self.segments, self.engrave, self.dxf_messages = saved
+        return self.block_cache[cache_key]
+
+    def place_coords(self,coords,engrave,offset,scale,rotate):
+        # scale, rotate and offset block segments the way add_coords does
+        xs, ys = scale
+        xo, yo = offset
+        if abs(rotate) > Zero:
+            rad = radians(rotate)
+            c = cos(rad)
+            s = sin(rad)
+            out = []
+            for i in range(0,len(coords),2):
+                xr = coords[i]*xs
+                yr = coords[i+1]*ys
+                out.append(xr*c - yr*s + xo)
+                out.append(xr*s + yr*c + yo)
+            self.segments.extend(out)
+        else:
+            out = array('d', coords)
+            out[0::2] = array('d', [x*xs + xo for x in coords[0::2]])
+            out[1::2] = array('d', [y*ys + yo for y in coords[1::2]])
+            self.segments.extend(out)
+        self.engrave.extend(engrave)
+
+    def line_type(self,color,layer):
+        # 1 for engrave, 0 for cut, None for hidden
         slcolor = 0
         if(type(layer)!=list):
             if layer in self.layer_color:     
@@ -547,13 +699,41 @@ class DXF_CLASS:
                     
         # Now test for Hidden layer IE Color < 0
         if ( slcolor != None) and (slcolor < 0):
-            return
+            return None
         if (color == None) or (color == 256): # 256 is ColorByLayer
             # default to layer color
             color = slcolor
         if ( color != None) and (color < 0):
+            return None
+
+        # Check if line is blue
+        Color_Blue    = (color == 5) or (color >= 140 and color <=180)
+        try:
+            Layer_Engrave = str.find(layer.upper(),'ENGRAVE') != -1
+        except:
+            Layer_Engrave = False
+            try:
+                for lay in layer:
+                    Layer_Engrave = (str.find(lay.upper(),'ENGRAVE') != -1) or Layer_Engrave
+            except:
+                pass
+            
+        if Color_Blue or Layer_Engrave:
+            return 1
+        else: #if (color >= 10 and color <=28) or (color >= 230 and color <=249): #red
+            return 0
+
+    def add_coords(self,line,offset,scale,rotate,color=None,layer=None):
+        # The type only depends on the colour and layer, so it is worked
+        # out once for each pair
+        key = (color, tuple(layer) if type(layer)==list else layer)
+        try:
+            engrave = self.line_types[key]
+        except KeyError:
+            engrave = self.line_types[key] = self.line_type(color,layer)
+        if engrave == None:
             return
-        
+
         x0s = line[0]*scale[0]
         y0s = line[1]*scale[1]
         x1s = line[2]*scale[0]
@@ -576,24 +756,8 @@ class DXF_CLASS:
         x1 = x1r + offset[0]
         y1 = y1r + offset[1]
 
-        # Check if line is blue
-        Color_Blue    = (color == 5) or (color >= 140 and color <=180)
-        try:
-            Layer_Engrave = str.find(layer.upper(),'ENGRAVE') != -1
-        except:
-            Layer_Engrave = False
-            try:
-                for lay in layer:
-                    Layer_Engrave = (str.find(lay.upper(),'ENGRAVE') != -1) or Layer_Engrave
-            except:
-                pass
-            
-        if Color_Blue or Layer_Engrave:
-            self.eng_coords.append([x0,y0,x1,y1])
-        else: #if (color >= 10 and color <=28) or (color >= 230 and color <=249): #red
-            self.cut_coords.append([x0,y0,x1,y1])
-            
-        self.coords.append([x0,y0,x1,y1])
+        self.segments.extend((x0,y0,x1,y1))
+        self.engrave.append(engrave)
 
     def eval_entity(self,e,bl,lin_tol=.001,offset=[0,0],scale=[1,1],rotate=0):
         try:
@@ -634,32 +798,7 @@ class DXF_CLASS:
             r     = e.data["40"]
             start = e.data["50"]
             end   = e.data["51"]
-
-            if end < start:
-                end=end+360.0
-            delta  = end-start
-
-            if (lin_tol < r):
-                step_deg = 2*acos((r-lin_tol)/r)*180/pi
-            else:
-                step_deg = 45
-            angle_steps = max(floor(delta/step_deg),2)
-
-            start_r = radians(start)
-            end_r   = radians(end)
-
-            step_phi = radians( delta/angle_steps )
-            x0 = x + r * cos(start_r)
-            y0 = y + r * sin(start_r)
-            pcnt = 1
-            while pcnt < angle_steps+1:
-                phi = start_r + pcnt*step_phi
-                x1 = x + r * cos(phi)
-                y1 = y + r * sin(phi)
-                self.add_coords([x0,y0,x1,y1],offset,scale,rotate,color,layer)
-                x0=x1
-                y0=y1
-                pcnt += 1
+            self.arc_coords(x,y,r,start,end,lin_tol,offset,scale,rotate,color,layer)
 
         ######### LWPOLYLINE ##########
         elif e.type == "LWPOLYLINE":
@@ -716,34 +855,7 @@ class DXF_CLASS:
             x = e.data["10"]
             y = e.data["20"]
             r = e.data["40"]
-
-            start = 0
-            end   = 360
-            if end < start:
-                end=end+360.0
-            delta  = end-start
-
-            if (lin_tol < r):
-                step_deg = 2*acos((r-lin_tol)/r)*180/pi
-            else:
-                step_deg = 45
-            angle_steps = max(floor(delta/step_deg),2)
-
-            start_r = radians( start )
-            end_r   = radians( end )
-
-            step_phi = radians( delta/angle_steps)
-            x0 = x + r * cos(start_r)
-            y0 = y + r * sin(start_r)
-            pcnt = 1
-            while pcnt < angle_steps+1:
-                phi = start_r + pcnt*step_phi
-                x1 = x + r * cos(phi)
-                y1 = y + r * sin(phi)
-                self.add_coords([x0,y0,x1,y1],offset,scale,rotate,color,layer)
-                x0=x1
-                y0=y1
-                pcnt += 1
+            self.arc_coords(x,y,r,0,360,lin_tol,offset,scale,rotate,color,layer)
 
         ############ SPLINE ###########
         elif e.type == "SPLINE":
@@ -1036,9 +1148,10 @@ class DXF_CLASS:
 
             xoff = xoff - x_block_ref
             yoff = yoff - y_block_ref
-            
-            for e in bl.blocks[key].entities:
-                self.eval_entity(e,bl,lin_tol,offset=[xoff,yoff],scale=[xscale,yscale],rotate=rotate)
+
+            coords, engrave, messages = self.block_coords(key,bl,lin_tol)
+            self.place_coords(coords,engrave,[xoff,yoff],[xscale,yscale],rotate)
+            self.dxf_messages = self.dxf_messages + messages
 
         ########### END INSERT ###########
 
@@ -1068,20 +1181,36 @@ class DXF_CLASS:
             pass
 
 
+    @timed('dxf.GET_DXF_DATA')
     def GET_DXF_DATA(self,fd, lin_tol=.001,get_units=False,units=None):
-        data = []
+        # parse and tessellate in one call, get_units stops after the parse
+        if self.PARSE_DXF_DATA(fd):
+            return 1
+        if get_units:
+            return
+        self.MAKE_DXF_COORDS(lin_tol)
+
+    @timed('dxf.PARSE_DXF_DATA')
+    def PARSE_DXF_DATA(self,fd):
+        # Read the file once into the header, layer, block and entity
+        # store and set self.units from $INSUNITS. Nothing is
+        # tessellated, so the units can pick lin_tol before
+        # MAKE_DXF_COORDS runs.
         try:
-            self.read_dxf_data(fd, data)
-        except:
+            self.parse_dxf_sections(self.iter_dxf_data(fd))
+        except UnicodeDecodeError:
             self.dxf_message("\nUnable to read input DXF data!")
             return 1
-        data = iter(data)
+        TIMER.count('group_codes', self.n_group_codes)
+
+    def parse_dxf_sections(self, data):
         g_code, value = None, None
         sections = dict()
 
         he = Header()
         bl = Blocks()
         la = Layers()
+        en = Entities()
         while value != "EOF":
             g_code, value = next(data)
             if value == "SECTION":
@@ -1117,7 +1246,6 @@ class DXF_CLASS:
 
                     elif value == "ENTITIES":
                         TYPE=""
-                        en = Entities()
                         while True:
                             g_code, value = next(data)
 
@@ -1165,11 +1293,16 @@ class DXF_CLASS:
         except:
             self.units = self.unit_vals[0]
 
-        if get_units:
-            return
-        
+        self.header = he
+        self.blocks = bl
+        self.layers = la
+        self.entities = en
+
+    @timed('dxf.MAKE_DXF_COORDS')
+    def MAKE_DXF_COORDS(self,lin_tol=.001):
+        # tessellate the parsed entities to lin_tol
         #Process Layers
-        for l in la.layers:
+        for l in self.layers.layers:
             try:
                 color = l.data["62"]
             except:
@@ -1181,63 +1314,29 @@ class DXF_CLASS:
             self.layer_color[name]=color
 
         #Process Entities
-        for e in en.entities:
-            self.eval_entity(e,bl,lin_tol)
+        for e in self.entities.entities:
+            self.eval_entity(e,self.blocks,lin_tol)
 
 
     def DXF_COORDS_GET(self,new_origin=True):
-        if (new_origin==True):
-            ymin=99999
-            xmin=99999
-            for line in self.coords:
-                XY=line
-                if XY[0] < xmin:
-                        xmin = XY[0]
-                if XY[1] < ymin:
-                        ymin = XY[1]
-                if XY[2] < xmin:
-                        xmin = XY[2]
-                if XY[3] < ymin:
-                        ymin = XY[3]
-        else:
-            xmin=0
-            ymin=0
-
-        coords_out=[]
-        for line in self.coords:
-            XY=line
-            coords_out.append([XY[0]-xmin, XY[1]-ymin, XY[2]-xmin, XY[3]-ymin])
-        return coords_out
-
+        return self.shift_coords(array('d', self.segments), new_origin)
 
     def DXF_COORDS_GET_TYPE(self,engrave=True,new_origin=True):
-        if engrave==True:
-            coords = self.eng_coords
-        else:
-            coords = self.cut_coords
-        
-        if (new_origin==True):
-            ymin=99999
-            xmin=99999
-            for line in coords:
-                XY=line
-                if XY[0] < xmin:
-                        xmin = XY[0]
-                if XY[1] < ymin:
-                        ymin = XY[1]
-                if XY[2] < xmin:
-                        xmin = XY[2]
-                if XY[3] < ymin:
-                        ymin = XY[3]
-        else:
-            xmin=0
-            ymin=0
+        # The segments of one type as a flat x0,y0,x1,y1 array
+        mask = self.engrave
+        if not engrave:
+            mask = map(operator.not_, mask)
+        coords = array('d', chain.from_iterable(compress(zip(*[iter(self.segments)]*4), mask)))
+        return self.shift_coords(coords, new_origin)
 
-        coords_out=[]
-        for line in coords:
-            XY=line
-            coords_out.append([XY[0]-xmin, XY[1]-ymin, XY[2]-xmin, XY[3]-ymin])
-        return coords_out
+    def shift_coords(self,coords,new_origin):
+        # move the lower left corner of the coords to 0,0
+        if new_origin==True and len(coords) > 0:
+            xmin = min(coords[0::2])
+            ymin = min(coords[1::2])
+            coords[0::2] = array('d', [x-xmin for x in coords[0::2]])
+            coords[1::2] = array('d', [y-ymin for y in coords[1::2]])
+        return coords
 
 
 
@@ -1353,8 +1452,7 @@ class DXF_CLASS:
         ## GCODE WRITING for Dxf_Write ##
         #################################
         #for line in side:
-        for line in self.coords:
-            XY = line
+        for line in zip(*[iter(self.segments)]*4):
             
             #if line[0] == 1 or (line[0] == 0 and Rapids):
             dxf_code.append("LINE")
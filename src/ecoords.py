@@ -16,6 +16,23 @@
 
 """
 from math import *
+from array import array
+
+def path_lengths(ecoords):
+    '''Return (on, move), the distance along ecoords with the laser on
+    and the jumps between loops, counted from the first point'''
+    on = 0.0
+    move = 0.0
+    for i in range(1,len(ecoords)):
+        p = ecoords[i-1]
+        q = ecoords[i]
+        dist = sqrt((q[0]-p[0])**2 + (q[1]-p[1])**2)
+        if q[2] == p[2]:
+            on = on + dist
+        else:
+            move = move + dist
+    return on, move
+
 
 class ECoord:
     def __init__(self):
@@ -27,6 +44,7 @@ class ECoord:
 
     def reset_path(self):
         self.ecoords    = []
+        self.arc_ecoords= []
         self.len        = None
         self.move       = 0
         self.sorted     = False
@@ -37,47 +55,66 @@ class ECoord:
         self.n_scanlines= 0
 
     def make_ecoords(self,coords,scale=1):
+        # Chain x0,y0,x1,y1 segments into loops. A segment starts a new
+        # loop when its start is more than Acc from the end of the one
+        # before it. The loop only does the chaining, the bounds come
+        # from the x and y columns of the points afterwards.
         self.reset()
         self.len  = 0
         self.move = 0
-        
-        xmax, ymax = -1e10, -1e10
-        xmin, ymin =  1e10,  1e10
         self.ecoords=[]
         Acc=.001
-        oldx = oldy = -99990.0
-        first_stroke = True
-        loop=0
-        for line in coords:
-            XY = line
-            x1 = XY[0]*scale
-            y1 = XY[1]*scale
-            x2 = XY[2]*scale
-            y2 = XY[3]*scale
-            dxline= x2-x1
-            dyline= y2-y1
-            len_line=sqrt(dxline*dxline + dyline*dyline)
-            if len_line==0.0:
+        if isinstance(coords,array):
+            # a flat x0,y0,x1,y1 array('d'), as the DXF reader hands over
+            coords = zip(*[iter(coords)]*4)
+
+        ecoords = self.ecoords
+        append = ecoords.append
+        # starts that are joined to the end before them are not in the
+        # ecoords but still count for the bounds
+        joined_x = []
+        joined_y = []
+        length = 0
+        move = 0
+        oldx = oldy = 0.0
+        loop = 0
+        for x1, y1, x2, y2 in coords:
+            x1 = x1*scale
+            y1 = y1*scale
+            x2 = x2*scale
+            y2 = y2*scale
+            dxline = x2-x1
+            dyline = y2-y1
+            len_line = sqrt(dxline*dxline + dyline*dyline)
+            if len_line == 0.0:
                 continue
-            dx = oldx - x1
-            dy = oldy - y1
-            dist   = sqrt(dx*dx + dy*dy)
-            # check and see if we need to move to a new discontinuous start point
-            if (dist > Acc) or first_stroke:
-                loop = loop+1
-                self.ecoords.append([x1,y1,loop])
-                if not first_stroke:
-                    self.move = self.move + dist
-                first_stroke = False
-                
-            self.len = self.len + len_line
-            self.ecoords.append([x2,y2,loop])
+            if loop == 0:
+                loop = 1
+                append([x1,y1,loop])
+            else:
+                dx = oldx - x1
+                dy = oldy - y1
+                dist = sqrt(dx*dx + dy*dy)
+                # check and see if we need to move to a new discontinuous start point
+                if dist > Acc:
+                    loop = loop+1
+                    append([x1,y1,loop])
+                    move = move + dist
+                else:
+                    joined_x.append(x1)
+                    joined_y.append(y1)
+            length = length + len_line
+            append([x2,y2,loop])
             oldx, oldy = x2, y2
-            xmax=max(xmax,x1,x2)
-            ymax=max(ymax,y1,y2)
-            xmin=min(xmin,x1,x2)
-            ymin=min(ymin,y1,y2)
-        self.bounds = (xmin,xmax,ymin,ymax)
+        self.len  = length
+        self.move = move
+
+        if ecoords == []:
+            self.bounds = (1e10,-1e10,1e10,-1e10)
+            return
+        xs = [p[0] for p in ecoords] + joined_x
+        ys = [p[1] for p in ecoords] + joined_y
+        self.bounds = (min(xs),max(xs),min(ys),max(ys))
 
     def set_ecoords(self,ecoords,data_sorted=False):
         self.ecoords = ecoords
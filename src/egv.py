@@ -27,11 +27,40 @@ from math import *
 from interpolate import interpolate
 from time import time
 from LaserSpeed import LaserSpeed
+from stage_timer import TIMER, timed
+from functools import lru_cache
+import re
+
+##############################################################################
+# Variable feed jobs ask for the same few speeds over and over, and each
+# code takes gearing lookups, float math and string formatting to make.
+@lru_cache(maxsize=4096)
+def speed_codes(Feed, Raster_step, board_code):
+    speed_text = LaserSpeed.get_code_from_speed(Feed, Raster_step, board=board_code)
+    return tuple([ord(c) for c in speed_text])
+
+# Direction codes (B T L R M) and E. A direction code that repeats the
+# last one of these is redundant, the controller is still going that way.
+MODAL_CODES = frozenset(b'BTLRME')
+# a direction code and the stretch up to its last repeat, only matches
+# where there is something to drop so plain runs are skipped at C speed
+REDUNDANT_RE = re.compile(rb'([BTLRM])((?:[^BTLRME]*\1)+)')
+
+def strip_redundant_bytes(data):
+    '''Drop repeated direction codes from EGV bytes'''
+    return REDUNDANT_RE.sub(lambda m: m.group(1) + m.group(2).replace(m.group(1), b''), data)
 
 ##############################################################################
 class egv:
-    def __init__(self, target=lambda s: sys.stdout.write(s)):
-        self.write = target
+    def __init__(self, target=lambda s: sys.stdout.write(s), strip_redundant=False):
+        # with strip_redundant repeated direction codes are dropped as they
+        # are written, the same result as strip_redundant_codes() afterwards
+        self.target = target
+        if strip_redundant:
+            self.write = self.write_stripped
+        else:
+            self.write = target
+        self.Modal_code = -1
         self.Modal_dir  = 0
         self.Modal_dist = 0
         self.Modal_on   = False
@@ -226,12 +255,7 @@ class egv:
 
     def make_speed(self,Feed=None,board_name="LASER-M2",Raster_step=0):
         board_code = board_name.split('-')[1]
-        speed_text = LaserSpeed.get_code_from_speed(Feed, abs(Raster_step), board=board_code)
-        
-        speed=[]
-        for c in speed_text:
-            speed.append(ord(c))
-        return speed
+        return speed_codes(Feed, abs(Raster_step), board_code)
 
 
     def make_move_data(self,dxmils,dymils):
@@ -258,6 +282,7 @@ class egv:
         return e0,e1,e2
 
 
+    @timed('egv.make_egv_data')
     def make_egv_data(self, ecoords_in,
                             startX=0,
                             startY=0,
@@ -279,6 +304,7 @@ class egv:
             stop_calc.append(0)
         if update_gui == None:
             update_gui = self.none_function
+        TIMER.count('ecoords', len(ecoords_in))
         ########################################################
         if units == 'in':
             scale      = 1000.0
@@ -356,9 +382,11 @@ class egv:
                             Feed_current    = round(ecoords_in[i][3]*variable_feed_scale,2)
                             Spindle = ecoords_in[i][4] > 0 and use_laser
                             if Feed != Feed_current:
+                                # feeds closer than the controller resolves share a code
+                                if self.make_speed(Feed_current,board_name) != self.make_speed(Feed,board_name):
+                                    self.flush()
+                                    self.change_speed(Feed_current,board_name,laser_on=Spindle)
                                 Feed = Feed_current
-                                self.flush()
-                                self.change_speed(Feed,board_name,laser_on=Spindle)
                         self.make_cut_line(dx,dy,Spindle)
                     else:
                         if ((abs(dx) < min_rapid) and (abs(dy) < min_rapid)) or Rapid_Feed_Rate:
@@ -691,19 +719,16 @@ class egv:
         if laser_on:    
             self.write(self.ON)
 
+    def write_stripped(self, code):
+        if code in MODAL_CODES:
+            if code == self.Modal_code and code != 69: #ord("E")=69
+                return
+            self.Modal_code = code
+        self.target(code)
+
+    @timed('egv.strip_redundant_codes')
     def strip_redundant_codes(self, EGV_data):
-        E = ord('E')
-        new_data=[]
-        modal_value = -1
-        for code in EGV_data:
-            if code == modal_value and modal_value != E:
-                continue
-            elif (code == self.RIGHT) or (code == self.LEFT) or \
-                 (code == self.UP   ) or (code == self.DOWN) or \
-                 (code == self.ANGLE) or (code == E):
-                modal_value = code
-            new_data.append(code)
-        return new_data
+        return list(strip_redundant_bytes(bytes(EGV_data)))
             
         
 if __name__ == "__main__":
@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+'''
+EGV to ecoords decoder for K40 Whisperer
+
+Copyright (C) 2024 whodafloater
+
+MIT license
+
+Turns EGV codes back into an ecoords path so saved EGV jobs can be
+previewed, time estimated and re-targeted, for example sent to an
+xTool through ecoord_to_gcode.
+
+Files saved with repeated direction codes stripped have distances
+right after D and U, those are moves in the last direction.
+
+The result uses the same layout as G_Code_Rip.generate_laser_paths:
+
+    [x, y, loop, feed, power]
+
+x and y are inches relative to the head position at the start of the
+job, y up. Each laser on run is one loop. feed is mm/s, decoded from
+the speed codes with LaserSpeed. EGV has no power setting, every
+point gets the power passed to the decoder.
+
+The codes are split up by EgvParser.tokenize, so only the command
+state machine runs per command in Python.
+
+EGV vectors are 1 mil staircases. Laser on moves are collapsed while
+they are decoded: a point is only kept where the path leaves a 1 mil
+band around a straight line from the last kept point, or where the
+loop ends. The cut and move lengths and the time still count every
+move.
+'''
+
+from math import asin, atan2, hypot, pi, sqrt
+from EgvParser import EgvParser
+from LaserSpeed import LaserSpeed
+
+MM_PER_MIL = 0.0254
+SQRT2 = sqrt(2.0)
+
+
+class LineRun:
+    '''Collapse the points of one loop into straight segments
+
+    Points are held back while they stay within tol of a straight
+    segment from the last point that was kept, the same wedge test as
+    path_fit.run_end. Coordinates are in mils.
+    '''
+    def __init__(self, out, tol=1.0):
+        self.out = out
+        self.tol = tol
+        self.pending = None
+
+    def start(self, x, y, loop, feed, power):
+        self.flush()
+        self.loop = loop
+        self.feed = feed
+        self.power = power
+        self.out.append([x*0.001, y*0.001, loop, feed, power])
+        self.anchor(x, y)
+
+    def anchor(self, x, y):
+        self.x0 = x
+        self.y0 = y
+        self.lo = -pi
+        self.hi = pi
+        self.ref = None
+        self.dmax = 0.0
+        self.pending = None
+
+    def add(self, x, y):
+        if not self.fits(x, y):
+            px, py = self.pending
+            self.out.append([px*0.001, py*0.001, self.loop, self.feed, self.power])
+            self.anchor(px, py)
+            self.fits(x, y)
+        self.pending = (x, y)
+
+    def fits(self, x, y):
+        tol = self.tol
+        dx = x - self.x0
+        dy = y - self.y0
+        d = hypot(dx, dy)
+        if d <= tol:
+            # still inside the tolerance circle of the start
+            return self.dmax - d <= tol
+        if self.ref == None:
+            self.ref = atan2(dy, dx)
+        ang = (atan2(dy, dx) - self.ref + pi) % (2*pi) - pi
+        if ang < self.lo or ang > self.hi or d < self.dmax - tol:
+            return False
+        self.dmax = max(self.dmax, d)
+        half = asin(min(tol/d, 1.0))
+        self.lo = max(self.lo, ang - half)
+        self.hi = min(self.hi, ang + half)
+        return True
+
+    def flush(self):
+        if self.pending != None:
+            px, py = self.pending
+            self.out.append([px*0.001, py*0.001, self.loop, self.feed, self.power])
+            self.pending = None
+
+
+class EgvDecoder:
+    def __init__(self, board_name="LASER-M2", power=0.0):
+        self.board = board_name.split('-')[-1]
+        self.power = power
+        self.feeds = {}    # speed code -> mm/s
+
+        self.cut_length  = 0.0    # inches with the laser on
+        self.move_length = 0.0    # inches of straight jumps between cuts
+        self.time        = 0.0    # seconds
+        self.loops       = 0
+
+    def speed(self, speed_code):
+        feed = self.feeds.get(speed_code)
+        if feed == None:
+            try:
+                feed = LaserSpeed.get_speed_from_code(speed_code, board=self.board)
+            except Exception as e:
+                raise Exception(f"Unable to decode EGV speed code {speed_code}: {e}")
+            self.feeds[speed_code] = feed
+        return feed
+
+    def decode(self, data):
+        '''Return ecoords for a buffer of EGV codes (no file header)'''
+        ecoords = []
+        run = LineRun(ecoords)
+        power = self.power
+
+        x = 0
+        y = 0
+        loop = 0
+        in_loop = False
+
+        cut_mils = 0.0
+        move_mils = 0.0
+        # laser off moves since the last laser on move, measured as one
+        # straight jump when the next cut starts
+        off_dx = 0
+        off_dy = 0
+        time = 0.0
+        timed_mils = 0.0    # motion already added to time
+
+        feed = 0.0
+        speed_code = ''
+        value_g = 0
+        is_compact = False
+        is_on = False
+        is_left = False
+        is_top = False
+        is_harmonic = False
+        is_finishing = False
+        is_resetting = False
+        last_dir = None
+
+        for commands, distances, numbers, args in EgvParser().tokenize(data, with_args=True):
+            for cmd, dist, number, arg in zip(commands, distances, numbers, args):
+                dist = dist + number
+                dx = 0
+                dy = 0
+
+                if cmd == b'D' or cmd == b'U':
+                    is_on = cmd == b'D'
+                    if not is_on:
+                        in_loop = False
+                    if dist == 0 or last_dir == None:
+                        continue
+                    # the direction code before this distance was stripped
+                    cmd = last_dir
+
+                if cmd == b'B':
+                    if is_compact and is_harmonic and is_left:
+                        # direction change in raster mode steps to the next line
+                        step = value_g if is_top else -value_g
+                        y = y + step
+                        off_dy = off_dy + step
+                        is_on = False
+                        in_loop = False
+                    dx = dist
+                    is_left = False
+                    last_dir = cmd
+                elif cmd == b'T':
+                    if is_compact and is_harmonic and not is_left:
+                        step = value_g if is_top else -value_g
+                        y = y + step
+                        off_dy = off_dy + step
+                        is_on = False
+                        in_loop = False
+                    dx = -dist
+                    is_left = True
+                    last_dir = cmd
+                elif cmd == b'R':
+                    if is_compact and is_harmonic and is_top:
+                        step = -value_g if is_left else value_g
+                        x = x + step
+                        off_dx = off_dx + step
+                        is_on = False
+                        in_loop = False
+                    dy = -dist
+                    is_top = False
+                    last_dir = cmd
+                elif cmd == b'L':
+                    if is_compact and is_harmonic and not is_top:
+                        step = -value_g if is_left else value_g
+                        x = x + step
+                        off_dx = off_dx + step
+                        is_on = False
+                        in_loop = False
+                    dy = dist
+                    is_top = True
+                    last_dir = cmd
+                elif cmd == b'M':
+                    dx = -dist if is_left else dist
+                    dy = dist if is_top else -dist
+                    last_dir = cmd
+                elif cmd == b'E':
+                    if is_finishing or is_resetting:
+                        is_compact = False
+                        is_on = False
+                        is_left = False
+                        is_top = False
+                        is_harmonic = False
+                        speed_code = ''
+                        value_g = 0
+                        is_finishing = False
+                        is_resetting = False
+                    else:
+                        is_compact = True
+                        if speed_code != '':
+                            move_mils = move_mils + hypot(off_dx, off_dy)
+                            off_dx = 0
+                            off_dy = 0
+                            # everything since the last speed change ran at the old feed
+                            if feed > 0.0:
+                                time = time + (cut_mils + move_mils - timed_mils)*MM_PER_MIL/feed
+                            timed_mils = cut_mils + move_mils
+                            feed = self.speed(speed_code)
+                    in_loop = False
+                    continue
+                elif cmd == b'C':
+                    is_harmonic = False
+                    value_g = 0
+                    speed_code = speed_code + 'C'
+                    continue
+                elif cmd == b'V':
+                    speed_code = speed_code + 'V' + arg.decode()
+                    continue
+                elif cmd == b'G':
+                    is_harmonic = True
+                    value_g = number
+                    speed_code = speed_code + 'G%03d' %(value_g)
+                    continue
+                elif cmd == b'N' or cmd == b'P':
+                    is_compact = False
+                    in_loop = False
+                    continue
+                elif cmd == b'F':
+                    is_finishing = True
+                    continue
+                elif cmd == b'@':
+                    is_resetting = True
+                    continue
+                else:
+                    # I, S and anything unknown
+                    continue
+
+                if dx == 0 and dy == 0:
+                    continue
+
+                length = dist*SQRT2 if dx != 0 and dy != 0 else dist
+
+                if is_on and is_compact:
+                    if off_dx != 0 or off_dy != 0:
+                        move_mils = move_mils + hypot(off_dx, off_dy)
+                        off_dx = 0
+                        off_dy = 0
+                    if not in_loop:
+                        loop = loop + 1
+                        in_loop = True
+                        run.start(x, y, loop, feed, power)
+                    x = x + dx
+                    y = y + dy
+                    run.add(x, y)
+                    cut_mils = cut_mils + length
+                else:
+                    x = x + dx
+                    y = y + dy
+                    off_dx = off_dx + dx
+                    off_dy = off_dy + dy
+
+        run.flush()
+        move_mils = move_mils + hypot(off_dx, off_dy)
+        if feed > 0.0:
+            time = time + (cut_mils + move_mils - timed_mils)*MM_PER_MIL/feed
+
+        self.cut_length = cut_mils*0.001
+        self.move_length = move_mils*0.001
+        self.time = time
+        self.loops = loop
+        return ecoords
+
+
+def decode_egv(data, board_name="LASER-M2", power=0.0):
+    '''Return (ecoords, decoder) for a buffer of EGV codes'''
+    decoder = EgvDecoder(board_name, power)
+    ecoords = decoder.decode(data)
+    return ecoords, decoder
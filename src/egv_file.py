@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+'''
+EGV file reading and writing for K40 Whisperer
+
+Copyright (C) 2024 whodafloater
+
+MIT license
+
+An EGV file is a few text header lines followed by
+
+    %y_start%x_start%y_end%x_end%<egv codes>
+
+The four values are in mils. The codes are the same bytes the egv
+encoder makes and the packetizer sends, possibly broken up with
+newlines and spaces.
+
+The file is read in one go and the payload is handed back as a
+buffer of ints the packetizer can index directly. The buffer is
+writable because multi pass sends patch the trailer in place.
+
+Writing builds the whole file as one bytes object and writes it with
+a single call. Long payloads can be wrapped into lines, the reader
+ignores the newlines either way.
+'''
+
+import os
+import re
+
+# header values start at the first '%'
+HEADER_RE = re.compile(rb'%\s*(-?\d+)\s*%\s*(-?\d+)\s*%\s*(-?\d+)\s*%\s*(-?\d+)\s*%')
+
+WHITESPACE = b' \t\r\n'
+
+PREAMBLE = b'Document type : LHYMICRO-GL file\nCreator-Software: K40 Whisperer\n\n'
+
+
+class EgvHeader:
+    def __init__(self, y_start=0, x_start=0, y_end=0, x_end=0):
+        self.y_start = y_start
+        self.x_start = x_start
+        self.y_end = y_end
+        self.x_end = x_end
+
+    def values(self):
+        return (self.y_start, self.x_start, self.y_end, self.x_end)
+
+    def encode(self):
+        return b'%%%d%%%d%%%d%%%d%%' %self.values()
+
+
+def read_egv(filename):
+    '''Return (EgvHeader, payload) for an EGV file'''
+    size = os.path.getsize(filename)
+    raw = bytearray(size)
+    with open(filename, 'rb') as f:
+        n = f.readinto(raw)
+    if n != size:
+        del raw[n:]
+    return parse_egv(raw, filename)
+
+
+def parse_egv(raw, filename='EGV data'):
+    '''Split raw EGV file bytes into header and payload
+
+       The payload is a memoryview into raw when the codes contain no
+       whitespace, otherwise a new bytearray with the whitespace removed.
+    '''
+    start = raw.find(b'%')
+    m = HEADER_RE.match(raw, start) if start > -1 else None
+    if m == None:
+        raise Exception(f"Unable to read EGV header values from {filename}")
+    header = EgvHeader(*[int(v) for v in m.groups()])
+
+    body = memoryview(raw)[m.end():]
+    if any(raw.find(c, m.end()) > -1 for c in (b' ', b'\t', b'\r', b'\n')):
+        payload = bytearray(body).translate(None, WHITESPACE)
+    else:
+        payload = body
+    return header, payload
+
+
+def format_egv(data, header=None, wrap=0):
+    '''Return the bytes of an EGV file for a list of egv codes
+
+       wrap  codes per line, 0 writes the payload as one line
+    '''
+    if header == None:
+        header = EgvHeader()
+    payload = bytes(data)
+    if wrap > 0 and len(payload) > wrap:
+        payload = b'\n'.join(payload[i:i+wrap] for i in range(0, len(payload), wrap))
+    return b''.join((PREAMBLE, header.encode(), payload, b'\n'))
+
+
+def write_egv(filename, data, header=None, wrap=0, fsync=False):
+    '''Write egv codes to a file with one write call
+
+       fsync  flush to disk before returning, for files that are
+              picked up by another machine or process right away
+    '''
+    raw = format_egv(data, header, wrap)
+    with open(filename, 'wb') as f:
+        f.write(raw)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    return len(raw)
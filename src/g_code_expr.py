@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+'''
+Compiled G-code math expressions for the G-code readers
+
+Copyright (C) 2025 whodafloater
+
+MIT license
+
+Bracketed expressions like
+
+    [#1 * 2 + SQRT[#<size>]]
+
+are parsed once into a Python function of the parameter table and
+cached by their text, so a line that is repeated with different
+parameter values is only parsed the first time.
+
+The operators are the ones in emulators/xtd1_flask/gcode_new.py plus
+the comparisons, in RS274NGC precedence order
+
+    **
+    *  /  MOD
+    +  -
+    EQ NE GT GE LT LE
+    AND OR XOR
+
+and the functions
+
+    ABS ACOS ASIN COS EXP FIX FUP LN ROUND SIN SQRT TAN
+    ATAN[y]/[x]  EXISTS[#<name>]
+
+Angles are in degrees. Text is expected upper case with spaces
+removed, which is how G_Code_Rip hands it over. Parameters that have
+not been set read as 0.
+'''
+
+import re
+from math import acos, asin, atan2, ceil, cos, degrees, exp, floor, log, radians, sin, sqrt, tan
+from functools import lru_cache
+
+FUNCTIONS = {
+    'ABS'   : abs,
+    'ACOS'  : lambda v: degrees(acos(v)),
+    'ASIN'  : lambda v: degrees(asin(v)),
+    'COS'   : lambda v: cos(radians(v)),
+    'EXP'   : exp,
+    'FIX'   : floor,
+    'FUP'   : ceil,
+    'LN'    : log,
+    'ROUND' : round,
+    'SIN'   : lambda v: sin(radians(v)),
+    'SQRT'  : sqrt,
+    'TAN'   : lambda v: tan(radians(v)),
+}
+
+# operator -> python source, by precedence level, loosest first
+BINARY = [
+    {'AND' : '_AND({0},{1})', 'OR' : '_OR({0},{1})', 'XOR' : '_XOR({0},{1})'},
+    {'EQ' : '_T({0}=={1})', 'NE' : '_T({0}!={1})', 'GT' : '_T({0}>{1})',
+     'GE' : '_T({0}>={1})', 'LT' : '_T({0}<{1})',  'LE' : '_T({0}<={1})'},
+    {'+' : '({0}+{1})', '-' : '({0}-{1})'},
+    {'*' : '({0}*{1})', '/' : '({0}/{1})', 'MOD' : '({0}%{1})'},
+    {'**' : '({0}**{1})'},
+]
+
+# the names the compiled source can see
+ENV = dict(('_' + name, fn) for name, fn in FUNCTIONS.items())
+ENV['_T']    = lambda b: 1.0 if b else 0.0
+ENV['_AND']  = lambda a, b: 1.0 if (a and b) else 0.0
+ENV['_OR']   = lambda a, b: 1.0 if (a or b) else 0.0
+ENV['_XOR']  = lambda a, b: 1.0 if (bool(a) ^ bool(b)) else 0.0
+ENV['_ATAN'] = lambda y, x: degrees(atan2(y, x))
+ENV['_F']    = float
+ENV['__builtins__'] = {}
+
+WORDS = sorted(set(FUNCTIONS) | {'ATAN', 'EXISTS', '[', ']'} | set().union(*BINARY), key=len, reverse=True)
+TOKEN_RE = re.compile(r'(\d+\.?\d*|\.\d+)|(#(?:<[^>]*>|[-+]?\d+))|(%s)' %
+                      '|'.join(re.escape(w) for w in WORDS))
+
+# A math region is a bracket, optionally after a function name
+REGION_START_RE = re.compile(r'(?:ATAN|EXISTS|%s)?\[' % '|'.join(FUNCTIONS))
+BRACKET_RE = re.compile(r'[\[\]]')
+
+
+def param_name(ref):
+    # named parameters (#<name>) are not case sensitive
+    if ref[1] == "<":
+        return ref.lower()
+    return ref
+
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        m = TOKEN_RE.match(text, pos)
+        if m is None:
+            raise ValueError("ERROR: Unable to evaluate expression: %s" %(text))
+        number, ref, word = m.groups()
+        if number is not None:
+            tokens.append(('number', number))
+        elif ref is not None:
+            tokens.append(('param', param_name(ref)))
+        else:
+            tokens.append(('op', word))
+        pos = m.end()
+    return tokens
+
+
+class Parser:
+    '''Precedence climbing parser that writes python source'''
+    def __init__(self, text):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def error(self):
+        return ValueError("ERROR: Unable to evaluate expression: %s" %(self.text))
+
+    def peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return (None, None)
+
+    def take(self, value=None):
+        tok = self.peek()
+        if tok[0] is None or (value is not None and tok[1] != value):
+            raise self.error()
+        self.pos += 1
+        return tok
+
+    def parse(self):
+        src = self.binary(0)
+        if self.pos != len(self.tokens):
+            raise self.error()
+        return src
+
+    def binary(self, level):
+        if level == len(BINARY):
+            return self.unary()
+        ops = BINARY[level]
+        src = self.binary(level + 1)
+        while self.peek()[0] == 'op' and self.peek()[1] in ops:
+            op = self.take()[1]
+            src = ops[op].format(src, self.binary(level + 1))
+        return src
+
+    def unary(self):
+        if self.peek() == ('op', '-'):
+            self.take()
+            return '(-%s)' %(self.unary())
+        if self.peek() == ('op', '+'):
+            self.take()
+            return self.unary()
+        return self.primary()
+
+    def bracket(self):
+        self.take('[')
+        src = self.binary(0)
+        self.take(']')
+        return src
+
+    def primary(self):
+        kind, value = self.take()
+        if kind == 'number':
+            return repr(float(value))
+        if kind == 'param':
+            return 'P.get(%r,0.0)' %(value)
+        if value == '[':
+            self.pos -= 1
+            return self.bracket()
+        if value == 'ATAN':
+            y = self.bracket()
+            self.take('/')
+            return '_ATAN(%s,%s)' %(y, self.bracket())
+        if value == 'EXISTS':
+            self.take('[')
+            kind, name = self.take()
+            if kind != 'param':
+                raise self.error()
+            self.take(']')
+            return '_T(%r in P)' %(name)
+        if value in FUNCTIONS:
+            return '_%s(%s)' %(value, self.bracket())
+        raise self.error()
+
+
+@lru_cache(maxsize=4096)
+def compile_expression(text):
+    '''Compile expression text into a function of the parameter table'''
+    src = Parser(text).parse()
+    return eval('lambda P: _F(%s)' %(src), ENV)
+
+
+def evaluate(text, params):
+    return compile_expression(text)(params)
+
+
+def find_regions(line):
+    '''Yield (start, end) of the top level math regions in a line'''
+    pos = 0
+    while True:
+        m = REGION_START_RE.search(line, pos)
+        if m is None:
+            return
+        end = bracket_end(line, m.end() - 1)
+        if m.group().startswith('ATAN') and line.startswith('/[', end):
+            end = bracket_end(line, end + 1)
+        yield m.start(), end
+        pos = end
+
+
+def bracket_end(line, start):
+    # index just past the bracket that closes the one at start
+    depth = 0
+    for bracket in BRACKET_RE.finditer(line, start):
+        if bracket.group() == '[':
+            depth = depth + 1
+        else:
+            depth = depth - 1
+            if depth == 0:
+                return bracket.end()
+    raise ValueError("ERROR: Unable to evaluate expression: %s" %(line[start:]))
@@ -22,6 +22,28 @@ import re
 import binascii
 import getopt
 import webbrowser
+from stage_timer import TIMER, timed
+from g_code_expr import evaluate, find_regions, param_name
+from arc_flatten import arc_steps, arc_points, arc_sweep
+
+# Patterns for tokenizing a G-code line in one pass.  Comments come out
+# first, then #parameters, then [math] regions and last the words.
+PAREN_COMMENT_RE = re.compile(r'\([^)]*\)?')
+PARAM_RE         = re.compile(r'#(?:<[^>]*>|[-+]?\d+)')
+UNSUPPORTED_RE   = re.compile(r'[ABCDELOQUVW]')
+WORD_RE          = re.compile(r'([A-Z#=])([^A-Z#=]*)')
+UCODES = ("A","B","C","D","E","L","O","Q","U","V","W")
+
+class GCodeAbort(Exception):
+    '''Raised by process_line when the rest of the file can not be read'''
+    pass
+
+def param_text(variables, ref):
+    # parameters that were never set are dropped from the line
+    name = param_name(ref)
+    if name in variables:
+        return "%.4f" %(variables[name])
+    return ''
 
 
 #################
@@ -40,6 +62,29 @@ class G_Code_Rip:
         self.arc_angle    = 2
         self.accuracy     = .001
         self.units        = "in"
+        self.XYarc2line   = False
+        self.initialize()
+
+    def initialize(self):
+        # Modal state of the parser, carried from one line to the next
+        self.READ_MSG = []
+        self.variables = {}
+        self.line_number = 0
+
+        self.mode_arc  = "incremental" # "absolute"
+        self.mode_pos = "absolute"    # "incremental"
+        self.g92offset = [0,0,0]
+
+        self.plane  = "17" # G17 (Z-axis, XY-plane), G18 (Y-axis, XZ-plane), or G19 (X-axis, YZ-plane)
+        self.scale = 1
+        self.POS     =[complex(0,1),complex(0,1),complex(0,1)]
+        self.feed = 0
+        self.spindle = 0
+
+        # Moves are held back until the start position is known, see release()
+        self.started = False
+        self.pending = []
+        self.first = [complex(0,1),complex(0,1),complex(0,1)]
 
     ################################################################################
     #             Function for outputting messages to different locations          #
@@ -58,6 +103,7 @@ class G_Code_Rip:
             except:
                 pass
 
+    @timed('gcode.Read_G_Code')
     def Read_G_Code(self,filename, XYarc2line = False, arc_angle=2, units="in", Accuracy=""):
         self.g_code_data  = []
         self.scaled_trans = []
@@ -65,6 +111,7 @@ class G_Code_Rip:
         self.left_side    = []
         self.probe_gcode  = []
         self.probe_coords = []
+        self.XYarc2line   = XYarc2line
         self.arc_angle    = arc_angle
         self.units        = units
         if Accuracy == "":
@@ -74,451 +121,377 @@ class G_Code_Rip:
                 self.accuracy = .025
         else:
             self.accuracy = float(Accuracy)
-        
-        READ_MSG = []
+
+        self.initialize()
 
         # Try to open file for reading
         try:
             fin = open(filename,'r')
         except:
-            READ_MSG.append("Unable to open file: %s" %(filename))
-            return READ_MSG
+            self.READ_MSG.append("Unable to open file: %s" %(filename))
+            return self.READ_MSG
 
-        scale = 1
-        variables = []
-        line_number = 0
+        with fin:
+            try:
+                self.g_code_data.extend(self.parse_lines(fin))
+            except GCodeAbort as e:
+                self.READ_MSG.append(str(e))
+
+        TIMER.count('lines', self.line_number)
+        TIMER.count('moves', len(self.g_code_data))
+        return self.READ_MSG
+
+    def parse_lines(self, lines):
+        '''Generator of g_code_data items for an iterable of G-code lines'''
+        for line in lines:
+            items = self.process_line(line)
+            if items:
+                yield from self.release(items)
+        yield from self.flush()
+
+    def release(self, items):
+        # Moves made before X, Y and Z have all been set hold complex
+        # placeholders.  Items are held back until the move that sets the
+        # last of them, then the placeholders are filled in and let go.
+        if self.started:
+            return items
+        first = self.first
+        for cnt, item in enumerate(items):
+            self.pending.append(item)
+            if item[0] == 0 or item[0] == 1 or item[0] == 2 or item[0] == 3:
+                for i in range(3):
+                    if (isinstance(first[i], complex)): first[i] = item[2][i]
+                if not isinstance(first[0] + first[1] + first[2], complex):
+                    self.started = True
+                    return self.flush() + items[cnt+1:]
+        return []
+
+    def flush(self):
+        # fill in the start position placeholders in the held back moves
+        first = self.first
+        for line in self.pending:
+            if line[0] == 1 or line[0] == 2 or line[0] == 3:
+                for i in range(3):
+                    if (isinstance(line[1][i], complex)):
+                        line[1][i] = first[i]
+                    if (isinstance(line[2][i], complex)):
+                        line[2][i] = first[i]
+        pending = self.pending
+        self.pending = []
+        return pending
+
+    def process_line(self, line):
+        '''Parse one line of G-code, returns the g_code_data items for it'''
+        self.line_number = self.line_number + 1
+        line_number = self.line_number
+        variables = self.variables
+        mode_arc  = self.mode_arc
+        mode_pos  = self.mode_pos
+        scale     = self.scale
+        feed      = self.feed
+        spindle   = self.spindle
+        plane     = self.plane
+        units     = self.units
+        POS       = self.POS
+        items     = []
 
         xind=0
         yind=1
         zind=2
 
-        mode_arc  = "incremental" # "absolute"
-        mode_pos = "absolute"    # "incremental"
-        offset = ['','','']
+        line = line.rstrip("\r\n")
+
+        #####################
+        ### FIND COMMENTS ###
+        #####################
+        if "(" in line:
+            for comment in PAREN_COMMENT_RE.findall(line):
+                items.append([ ";", comment ])
+            line = PAREN_COMMENT_RE.sub("", line)
+
+        s = line.find(";")
+        if s != -1:
+            items.append([ ";", line[s:] ])
+            line = line[:s]
+
+        # Switch remaining non comment data to upper case
+        # and remove spaces
+        line = line.upper().replace(" ","")
+
+        #####################################################
+        # Find # chars and check for a variable definition  #
+        #####################################################
+        define = None
+        if "#" in line:
+            # only the right most definition on a line counts,
+            # the text to the left of it is dropped
+            for ref in PARAM_RE.finditer(line):
+                if line.startswith("=", ref.end()):
+                    define = ref
+        if define is not None:
+            expr = line[define.end()+1:]
+            try:
+                vval = float(expr)
+            except:
+                try:
+                    vval = evaluate(expr, variables)
+                except:
+                    raise GCodeAbort(str(sys.exc_info()[1]))
+            variables[param_name(define.group())] = vval
+            line = ''
 
-        mvtype = 1  # G0 (Rapid), G1 (linear), G2 (clockwise arc) or G3 (counterclockwise arc). 
-        plane  = "17" # G17 (Z-axis, XY-plane), G18 (Y-axis, XZ-plane), or G19 (X-axis, YZ-plane)
-        pos     =['','','']
-        pos_last=['','','']
-        POS     =[complex(0,1),complex(0,1),complex(0,1)]
-        feed = 0
-        spindle = 0
-        
         #########################
-        for line in fin:
-            line_number = line_number + 1
-            #print line_number
-            line = line.replace("\n","")
-            line = line.replace("\r","")
-            code_line=[]
-            
-            #####################
-            ### FIND COMMENTS ###
-            #####################
-            if line.find("(") != -1:
-                s = line.find("(")
-                while s != -1:
-                    e = line.find(")")
-                    code_line.append([ ";", line[s:e+1] ])
-                    line = self.rm_text(line,s,e)
-                    s = line.find("(")
-            
-            if line.find(";") != -1:
-                s = line.find(";")
-                e = len(line)
-                code_line.append([ ";", line[s:e] ])
-                line = self.rm_text(line,s,e)
-            # If comment exists write it to output 
-            if code_line!= []: 
-                for comment in code_line:
-                    self.g_code_data.append(comment)
-                code_line=[]
-
-            # Switch remaining non comment data to upper case
-            # and remove spaces
-            line = line.upper()
-            line = line.replace(" ","")
+        ### FIND MATH REGIONS ###
+        #########################
+        if "[" in line and line[0] != "[":
+            pieces = []
+            last = 0
+            try:
+                for s, e in find_regions(line):
+                    pieces.append(line[last:s])
+                    pieces.append("%.4f" %(evaluate(line[s:e], variables)))
+                    last = e
+            except Exception as e:
+                MSG = "%s ( G-Code File Line: %d )" %(e, line_number)
+                raise ValueError(MSG)
+            pieces.append(line[last:])
+            line = "".join(pieces)
+
+        # what is left of the parameters are plain values
+        if "#" in line:
+            line = PARAM_RE.sub(lambda ref: param_text(variables, ref.group()), line)
+
+        ####################################
+        ### FIND FULLY UNSUPPORTED CODES ###
+        ####################################
+        # D Tool radius compensation number
+        # E ...
+        # L ...
+        # O ... Subroutines
+        # Q Feed increment in G73, G83 canned cycles
+        # A A axis of machine
+        # B B axis of machine
+        # C C axis of machine
+        # U U axis of machine
+        # V V axis of machine
+        # W W axis of machine
+
+        if UNSUPPORTED_RE.search(line) is not None:
+            found = set(UNSUPPORTED_RE.findall(line))
+            for code in UCODES:
+                if code in found:
+                    self.READ_MSG.append("Warning: %s Codes are not supported ( G-Code File Line: %d )" %(code,line_number))
+            return items
+
+        ##############################
+        ###    FIND ALL CODES      ###
+        ##############################
+        # F Feed rate
+        # G General function
+        # I X offset for arcs and G87 canned cycles
+        # J Y offset for arcs and G87 canned cycles
+        # K Z offset for arcs and G87 canned cycles. Spindle-Motion Ratio for G33 synchronized movements.
+        # M Miscellaneous function (See table Modal Groups)
+        # P Dwell time in canned cycles and with G4. Key used with G10. Used with G2/G3.
+        # R Arc radius or canned cycle plane
+        # S Spindle speed
+        # T Tool selection
+        # X X axis of machine
+        # Y Y axis of machine
+        # Z Z axis of machine
+
+        code_line = WORD_RE.findall(line)
 
-            
-            #####################################################
-            # Find # chars and check for a variable definition  #
-            #####################################################
-            if line.find("#") != -1:
-                s = line.rfind("#")
-                while s != -1:
-                    if line[s+1] == '<':
-                        e = s+2
-                        while line[e] != '>' and e <= len(line):
-                            e = e+1
-                        e = e+1
-                        vname = line[s:e].lower()
+        #################################
+                
+        mv_flag   = 0
+        mvtype = ''    # keep false move out of data  M205 X426 Y403
+        POS_LAST = POS[:]
+        #CENTER  = ['','','']
+        CENTER   = POS_LAST[:]
+        passthru = ""
+        for com in code_line:
+            if com[0] == "G":
+                Gnum = "%g" %(float(com[1]))
+                if Gnum == "0" or Gnum == "1":
+                    mvtype = int(Gnum)
+                elif Gnum == "2" or Gnum == "3":
+                    mvtype = int(Gnum)
+                    #CENTER = POS_LAST[:]
+                elif Gnum == "17":
+                    plane = Gnum
+                elif Gnum == "18":
+                    plane = Gnum
+                elif Gnum == "19":
+                    plane = Gnum
+                elif Gnum == "20":
+                    if units == "in":
+                        scale = 1
                     else:
-                        vname = re.findall(r'[-+]?\d+',line[s:])[0]	
-                        e = s + 1 + len(vname)
-                        vname = line[s:e]
-
-                    DEFINE = False
-                    if e < len(line):
-                        if line[e]=="=":
-                            DEFINE = True
-                    if DEFINE:
-                        try:
-                            vval = "%.4f" %(float(line[e+1:]))
-                            line = ''
-                        except:
-                            try:
-                                vval = self.EXPRESSION_EVAL(line[e+1:])
-                                line = ''
-                            except:
-                                READ_MSG.append(str(sys.exc_info()[1]))
-                                return READ_MSG
-                            
-                        variables.append([vname,vval])
-                        line  = self.rm_text(line,s,e-1)
+                        scale = 25.4
+                elif Gnum == "21":
+                    if units == "mm":
+                        scale = 1
                     else:
-                        line = self.rm_text(line,s,e-1)
-                        VALUE = ''
-                        for V in variables:
-                            if V[0] == vname:
-                                VALUE = V[1]
-                                
-                        line = self.insert_text(line,VALUE,s)
-                        
-                    s = line.rfind("#")
-
-            #########################
-            ### FIND MATH REGIONS ###
-            #########################
-            if line.find("[") != -1 and line.find("[") != 0:
-                ############################
-                s = line.find("[")
-                while s != -1:
-                    e = s + 1
-                    val = 1
-                    while val > 0:
-                        if e >= len(line):
-                            MSG = "ERROR: Unable to evaluate expression: G-Code Line %d" %(line_number)
-                            raise ValueError(MSG)
-                        if line[e]=="[":
-                            val = val + 1
-                        elif line[e] == "]":
-                            val = val - 1
-                        e = e + 1
-                        
-                    new_val = self.EXPRESSION_EVAL(line[s:e])
+                        scale = 1.0/25.4
+                elif Gnum == "81":
+                    self.READ_MSG.append("Warning: G%s Codes are not supported ( G-Code File Line: %d )" %(Gnum,line_number))
+                elif Gnum == "90.1":
+                    mode_arc = "absolute"
                     
-                    line = self.rm_text(line,s,e-1)
-                    line = self.insert_text(line,new_val,s)
-                    s = line.find("[")
-                #############################
-
+                elif Gnum == "90":
+                    mode_pos = "absolute"
 
-            ####################################
-            ### FIND FULLY UNSUPPORTED CODES ###
-            ####################################
-            # D Tool radius compensation number
-            # E ...
-            # L ...
-            # O ... Subroutines
-            # Q Feed increment in G73, G83 canned cycles
-            # A A axis of machine
-            # B B axis of machine
-            # C C axis of machine
-            # U U axis of machine
-            # V V axis of machine
-            # W W axis of machine
-
-            UCODES = ("A","B","C","D","E","L","O","Q","U","V","W")
-            skip = False
-            for code in UCODES:
-                if line.find(code) != -1:
-                    READ_MSG.append("Warning: %s Codes are not supported ( G-Code File Line: %d )" %(code,line_number))
-                    skip = True
-            if skip:
-                continue
+                elif Gnum == "91":
+                    mode_pos = "incremental"
+                
+                elif Gnum == "91.1":
+                    mode_arc = "incremental"
+
+                elif Gnum == "92":
+                    mvtype = 92   # offset command for Xtool-D1
+                    #self.READ_MSG.append("Aborting G-Code Reading: G%s Codes are not supported" %(Gnum))
+                    #self.READ_MSG.append("Warning: G%s Codes are not supported ( G-Code File Line: %d )" %(Gnum,line_number))
+                    #return READ_MSG
                     
-
-            ##############################
-            ###    FIND ALL CODES      ###
-            ##############################
-            # F Feed rate
-            # G General function
-            # I X offset for arcs and G87 canned cycles
-            # J Y offset for arcs and G87 canned cycles
-            # K Z offset for arcs and G87 canned cycles. Spindle-Motion Ratio for G33 synchronized movements.
-            # M Miscellaneous function (See table Modal Groups)
-            # P Dwell time in canned cycles and with G4. Key used with G10. Used with G2/G3.
-            # R Arc radius or canned cycle plane
-            # S Spindle speed
-            # T Tool selection
-            # X X axis of machine
-            # Y Y axis of machine
-            # Z Z axis of machine
+                elif Gnum == "38.2":
+                    self.READ_MSG.append("Warning: G%s Codes are not supported ( G-Code File Line: %d )" %(Gnum,line_number))
+                    #self.READ_MSG.append("Aborting G-Code Reading: G%s Codes are not supported" %(Gnum))
+                    #return READ_MSG
+                
+                else:
+                    passthru = passthru +  "%s%s " %(com[0],com[1])
             
-            ALL = ("A","B","C","D","E","F","G","H","I","J",\
-                   "K","L","M","N","O","P","Q","R","S","T",\
-                   "U","V","W","X","Y","Z","#","=")
-            temp = []
-            line = line.replace(" ","")
-            for code in ALL:
-                index=-1
-                index = line.find(code,index+1)
-                while index != -1:
-                    temp.append([code,index])
-                    index = line.find(code,index+1)
-            temp.sort(key=lambda a:a[1])
-
-            code_line=[]
-            if temp != []:
-                x = 0
-                while x <= len(temp)-1:
-                    s = temp[x][1]+1
-                    if x == len(temp)-1:
-                        e = len(line)
-                    else:    
-                        e = temp[x+1][1]
-                    
-                    CODE  = temp[x][0]
-                    VALUE = line[s:e]
-                    code_line.append([ CODE, VALUE ])
-                    x = x + 1
+            elif com[0] == "X":
+                if mode_pos == "absolute":
+                    POS[xind] = float(com[1])*scale
+                else:
+                    POS[xind] = float(com[1])*scale + POS_LAST[xind]
+                mv_flag = 1
 
-            #################################
-                    
-            mv_flag   = 0
-            mvtype = ''    # keep false move out of data  M205 X426 Y403
-            POS_LAST = POS[:]
-            #CENTER  = ['','','']
-            CENTER   = POS_LAST[:]
-            passthru = ""
-            for com in code_line:
-                if com[0] == "G":
-                    Gnum = "%g" %(float(com[1]))
-                    if Gnum == "0" or Gnum == "1":
-                        mvtype = int(Gnum)
-                    elif Gnum == "2" or Gnum == "3":
-                        mvtype = int(Gnum)
-                        #CENTER = POS_LAST[:]
-                    elif Gnum == "17":
-                        plane = Gnum
-                    elif Gnum == "18":
-                        plane = Gnum
-                    elif Gnum == "19":
-                        plane = Gnum
-                    elif Gnum == "20":
-                        if units == "in":
-                            scale = 1
-                        else:
-                            scale = 25.4
-                    elif Gnum == "21":
-                        if units == "mm":
-                            scale = 1
-                        else:
-                            scale = 1.0/25.4
-                    elif Gnum == "81":
-                        READ_MSG.append("Warning: G%s Codes are not supported ( G-Code File Line: %d )" %(Gnum,line_number))
-                    elif Gnum == "90.1":
-                        mode_arc = "absolute"
-                        
-                    elif Gnum == "90":
-                        mode_pos = "absolute"
+            elif com[0] == "Y":
+                if mode_pos == "absolute":
+                    POS[yind] = float(com[1])*scale
+                else:
+                    POS[yind] = float(com[1])*scale + POS_LAST[yind]
+                mv_flag = 1
 
-                    elif Gnum == "91":
-                        mode_pos = "incremental"
-                    
-                    elif Gnum == "91.1":
-                        mode_arc = "incremental"
-
-                    elif Gnum == "92":
-                        mvtype = 92   # offset command for Xtool-D1
-                        #READ_MSG.append("Aborting G-Code Reading: G%s Codes are not supported" %(Gnum))
-                        #READ_MSG.append("Warning: G%s Codes are not supported ( G-Code File Line: %d )" %(Gnum,line_number))
-                        #return READ_MSG
-                        
-                    elif Gnum == "38.2":
-                        READ_MSG.append("Warning: G%s Codes are not supported ( G-Code File Line: %d )" %(Gnum,line_number))
-                        #READ_MSG.append("Aborting G-Code Reading: G%s Codes are not supported" %(Gnum))
-                        #return READ_MSG
-                    
-                    else:
-                        passthru = passthru +  "%s%s " %(com[0],com[1])
-                
-                elif com[0] == "X":
-                    if mode_pos == "absolute":
-                        POS[xind] = float(com[1])*scale
-                    else:
-                        POS[xind] = float(com[1])*scale + POS_LAST[xind]
-                    mv_flag = 1
+            elif com[0] == "Z":
+                if mode_pos == "absolute":
+                    POS[zind] = float(com[1])*scale
+                else:
+                    POS[zind] = float(com[1])*scale + POS_LAST[zind]
+                mv_flag = 1
 
-                elif com[0] == "Y":
-                    if mode_pos == "absolute":
-                        POS[yind] = float(com[1])*scale
-                    else:
-                        POS[yind] = float(com[1])*scale + POS_LAST[yind]
+            ###################
+            elif com[0] == "I":
+                if mode_arc == "absolute":
+                    CENTER[xind] = float(com[1])*scale
+                else:
+                    CENTER[xind] = float(com[1])*scale + POS_LAST[xind]
+                if (mvtype==2 or mvtype==3):
                     mv_flag = 1
-
-                elif com[0] == "Z":
-                    if mode_pos == "absolute":
-                        POS[zind] = float(com[1])*scale
-                    else:
-                        POS[zind] = float(com[1])*scale + POS_LAST[zind]
+                
+            elif com[0] == "J":
+                if mode_arc == "absolute":
+                    CENTER[yind] = float(com[1])*scale
+                else:
+                    CENTER[yind] = float(com[1])*scale + POS_LAST[yind]
+                if (mvtype==2 or mvtype==3):
+                    mv_flag = 1
+            elif com[0] == "K":
+                if mode_arc == "absolute":
+                    CENTER[zind] = float(com[1])*scale
+                else:
+                    CENTER[zind] = float(com[1])*scale + POS_LAST[zind]
+                if (mvtype==2 or mvtype==3):
                     mv_flag = 1
 
-                ###################
-                elif com[0] == "I":
-                    if mode_arc == "absolute":
-                        CENTER[xind] = float(com[1])*scale
-                    else:
-                        CENTER[xind] = float(com[1])*scale + POS_LAST[xind]
-                    if (mvtype==2 or mvtype==3):
-                        mv_flag = 1
-                    
-                elif com[0] == "J":
-                    if mode_arc == "absolute":
-                        CENTER[yind] = float(com[1])*scale
-                    else:
-                        CENTER[yind] = float(com[1])*scale + POS_LAST[yind]
-                    if (mvtype==2 or mvtype==3):
-                        mv_flag = 1
-                elif com[0] == "K":
-                    if mode_arc == "absolute":
-                        CENTER[zind] = float(com[1])*scale
-                    else:
-                        CENTER[zind] = float(com[1])*scale + POS_LAST[zind]
-                    if (mvtype==2 or mvtype==3):
-                        mv_flag = 1
-
-                elif com[0] == "R":
-                    Rin= float(com[1])*scale
-                    CENTER = self.get_center(POS,POS_LAST,Rin,mvtype,plane)
-                        
-                ###################
-                elif com[0] == "F":
-                    feed = float(com[1]) * scale
+            elif com[0] == "R":
+                Rin= float(com[1])*scale
+                CENTER = self.get_center(POS,POS_LAST,Rin,mvtype,plane)
                     
-                elif com[0] == "S":
-                    spindle = float(com[1])
+            ###################
+            elif com[0] == "F":
+                feed = float(com[1]) * scale
+                
+            elif com[0] == "S":
+                spindle = float(com[1])
 
-                elif com[0] == ";":
-                    passthru = passthru + "%s " %(com[1])
+            elif com[0] == ";":
+                passthru = passthru + "%s " %(com[1])
 
-                elif com[0] == "P" and mv_flag == 1 and mvtype > 1:
-                    READ_MSG.append("Aborting G-Code Reading: P word specifying the number of full or partial turns of arc are not supported")
-                    return READ_MSG
+            elif com[0] == "P" and mv_flag == 1 and mvtype > 1:
+                raise GCodeAbort("Aborting G-Code Reading: P word specifying the number of full or partial turns of arc are not supported")
 
-                elif com[0] == "M":
-                    Mnum = "%g" %(float(com[1]))
-                    if Mnum == "2":
-                        self.g_code_data.append([ "M2", "(END PROGRAM)" ])
-                    passthru = passthru + "%s%s " %(com[0],com[1])
+            elif com[0] == "M":
+                Mnum = "%g" %(float(com[1]))
+                if Mnum == "2":
+                    items.append([ "M2", "(END PROGRAM)" ])
+                passthru = passthru + "%s%s " %(com[0],com[1])
 
-                elif com[0] == "N":
-                    pass
-                    #print "Ignoring Line Number %g" %(float(com[1]))
-                    
-                else:
-                    passthru = passthru + "%s%s " %(com[0],com[1])
+            elif com[0] == "N":
+                pass
+                #print "Ignoring Line Number %g" %(float(com[1]))
+                
+            else:
+                passthru = passthru + "%s%s " %(com[0],com[1])
 
-            pos      = POS[:]
-            pos_last = POS_LAST[:]
-            center = CENTER[:]
+        pos      = POS[:]
+        pos_last = POS_LAST[:]
+        center = CENTER[:]
  
-            # Most command on a line are executed prior to a move so 
-            # we will write the passthru commands on the line before we found them
-            # only "M0, M1, M2, M30 and M60" are executed after the move commands
-            # there is a risk that one of these commands could stop the program before
-            # the move is completed
-
-            if passthru != '':
-                self.g_code_data.append("%s" %(passthru))
-
-            #print(f'gparse:  mvtype={mvtype}  {pos}')
-
-            ###############################################################################
-            if mv_flag == 1:
-                if mvtype == 0:
-                    self.g_code_data.append([mvtype,pos_last[:],pos[:]])
-                if mvtype == 1:
-                    self.g_code_data.append([mvtype,pos_last[:],pos[:],feed,spindle])
-                if mvtype == 2 or mvtype == 3:
-                    if plane == "17":
-                        if XYarc2line == False:
-                            self.g_code_data.append([mvtype,pos_last[:],pos[:],center[:],feed,spindle])
-                        else:
-                            data = self.arc2lines(pos_last[:],pos[:],center[:], mvtype, plane)
-                            
-                            for line in data:
-                                XY=line
-                                self.g_code_data.append([1,XY[:3],XY[3:],feed,spindle])
-                                
-                    elif plane == "18":
+        # Most command on a line are executed prior to a move so 
+        # we will write the passthru commands on the line before we found them
+        # only "M0, M1, M2, M30 and M60" are executed after the move commands
+        # there is a risk that one of these commands could stop the program before
+        # the move is completed
+
+        if passthru != '':
+            items.append("%s" %(passthru))
+
+        #print(f'gparse:  mvtype={mvtype}  {pos}')
+
+        ###############################################################################
+        if mv_flag == 1:
+            if mvtype == 0:
+                items.append([mvtype,pos_last[:],pos[:]])
+            elif mvtype == 1:
+                items.append([mvtype,pos_last[:],pos[:],feed,spindle])
+            elif mvtype == 2 or mvtype == 3:
+                if plane == "17":
+                    if self.XYarc2line == False:
+                        items.append([mvtype,pos_last[:],pos[:],center[:],feed,spindle])
+                    else:
                         data = self.arc2lines(pos_last[:],pos[:],center[:], mvtype, plane)
+                        
                         for line in data:
                             XY=line
-                            self.g_code_data.append([1,XY[:3],XY[3:],feed,spindle])
+                            items.append([1,XY[:3],XY[3:],feed,spindle])
                             
-                    elif plane == "19":
-                        data = self.arc2lines(pos_last[:],pos[:],center[:], mvtype, plane)
-                        for line in data:
-                            XY=line
-                            self.g_code_data.append([1,XY[:3],XY[3:],feed,spindle])
-            ###############################################################################
-            #################################
-        fin.close()
-                    
-        ## Post process the g-code data to remove complex numbers
-        cnt = 0
-        firstx = complex(0,1)
-        firsty = complex(0,1)
-        firstz = complex(0,1)
-        first_sum = firstx + firsty + firstz
-        while ((cnt < len(self.g_code_data)) and (isinstance(first_sum, complex))):
-            line = self.g_code_data[cnt]
-            if line[0] == 0 or line[0] == 1 or line[0] == 2 or line[0] == 3:
-                if (isinstance(firstx, complex)): firstx = line[2][0]
-                if (isinstance(firsty, complex)): firsty = line[2][1]
-                if (isinstance(firstz, complex)): firstz = line[2][2]
-            cnt=cnt+1
-            first_sum = firstx + firsty + firstz
-        max_cnt = cnt
-        cnt = 0
-        ambiguousX = False
-        ambiguousY = False
-        ambiguousZ = False
-        while (cnt < max_cnt):
-            line = self.g_code_data[cnt]
-            if line[0] == 1 or line[0] == 2 or line[0] == 3:
-                # X Values
-                if (isinstance(line[1][0], complex)):
-                    line[1][0] = firstx
-                    ambiguousX = True
-                if (isinstance(line[2][0], complex)):
-                    line[2][0] = firstx
-                    ambiguousX = True
-                # Y values
-                if (isinstance(line[1][1], complex)):
-                    line[1][1] = firsty
-                    ambiguousY = True
-                if (isinstance(line[2][1], complex)):
-                    line[2][1] = firsty
-                    ambiguousY = True
-                # Z values
-                if (isinstance(line[1][2], complex)):
-                    line[1][2] = firstz
-                    ambiguousZ = True
-                if (isinstance(line[2][2], complex)):
-                    line[2][2] = firstz
-                    ambiguousZ = True
-            cnt=cnt+1
-        #if (ambiguousX or ambiguousY or ambiguousZ):
-        #    MSG = "Ambiguous G-Code start location:\n"
-        #    if (ambiguousX):  MSG = MSG + "X position is not set by a G0(rapid) move prior to a G1,G2 or G3 move.\n"
-        #    if (ambiguousY):  MSG = MSG + "Y position is not set by a G0(rapid) move prior to a G1,G2 or G3 move.\n"
-        #    if (ambiguousZ):  MSG = MSG + "Z position is not set by a G0(rapid) move prior to a G1,G2 or G3 move.\n"
-        #    MSG = MSG + "!! Review output files carefully !!"
-        #    READ_MSG.append(MSG)
-        
-        return READ_MSG
+                elif plane == "18":
+                    data = self.arc2lines(pos_last[:],pos[:],center[:], mvtype, plane)
+                    for line in data:
+                        XY=line
+                        items.append([1,XY[:3],XY[3:],feed,spindle])
+                        
+                elif plane == "19":
+                    data = self.arc2lines(pos_last[:],pos[:],center[:], mvtype, plane)
+                    for line in data:
+                        XY=line
+                        items.append([1,XY[:3],XY[3:],feed,spindle])
+            elif mvtype == 92:
+                self.g92offset = pos[:]
+        ###############################################################################
+        #################################
+        self.mode_arc = mode_arc
+        self.mode_pos = mode_pos
+        self.scale    = scale
+        self.feed     = feed
+        self.spindle  = spindle
+        self.plane    = plane
+        return items
+
 
     def get_center(self,POS,POS_LAST,Rin,mvtype,plane="17"):
         if   plane == "18":
@@ -1464,75 +1437,39 @@ class G_Code_Rip:
             yind=1
             zind=2
         
-        R = sqrt( (cent[xind]-p1[xind])**2 + (cent[yind]-p1[yind])**2 )
+        # sweep from p1 to p2, counter clockwise for G3 and clockwise for G2
+        R, start, sweep = arc_sweep(p1[xind], p1[yind], p2[xind], p2[yind],
+                                    cent[xind], cent[yind], code == 3)
         Rt= sqrt( (cent[xind]-p2[xind])**2 + (cent[yind]-p2[yind])**2 )
         if abs(R-Rt) > self.accuracy:  self.fmessage("Radius Warning: R1=%f R2=%f "%(R,Rt))
 
-        if code == 3:
-            theta = self.Get_Angle2(p1[xind]-cent[xind],p1[yind]-cent[yind])
-            xbeta,ybeta = self.Transform(p2[xind]-cent[xind],p2[yind]-cent[yind],radians(-theta))
-            X1 = p1[xind]
-            Y1 = p1[yind]
-            Z1 = p1[zind]
-            zstart = Z1
-            zend   = p2[zind]
-        if code == 2:
-            theta = self.Get_Angle2(p2[xind]-cent[xind],p2[yind]-cent[yind])
-            xbeta,ybeta = self.Transform(p1[xind]-cent[xind],p1[yind]-cent[yind],radians(-theta))
-            X1 = p2[xind]
-            Y1 = p2[yind]
-            Z1 = p2[zind]
-            zstart = Z1
-            zend   = p1[zind]
-            
-        beta  = self.Get_Angle2(xbeta,ybeta) #,code)
-        
-        if abs(beta) <= self.Zero: beta = 360.0
-        ##########################################
-        arc_step=self.arc_angle
-        
-        my_range=[]
-        
-        at=arc_step
-        while at < beta:
-            my_range.append(at)
-            at = at+arc_step
-        my_range.append(beta)
-
-        
+        # the step count comes from the chord tolerance
+        steps = arc_steps(R, sweep, self.accuracy)
+        pts = arc_points(cent[xind], cent[yind], R, start, sweep, steps)
+        pts[-2] = p2[xind]
+        pts[-1] = p2[yind]
 
+        X1 = p1[xind]
+        Y1 = p1[yind]
+        Z1 = p1[zind]
+        dz = (p2[zind]-p1[zind])/steps
         new_lines=[]
-        for at in my_range:
-            xt,yt = self.Transform(R,0,radians(theta+at))
-
-            X2 = cent[xind] + xt
-            Y2 = cent[yind] + yt
-            #Z2 = p1[zind] + at*(p2[zind]-p1[zind])/beta
-            Z2 = zstart + at*(zend-zstart)/beta
-            data = ["","","","","",""]
-
-
-            if code == 3:
-                data[xind]=X1
-                data[yind]=Y1
-                data[zind]=Z1
-                data[3+xind]=X2
-                data[3+yind]=Y2
-                data[3+zind]=Z2
-                new_lines.append(data)
-            else:
-                data[xind]=X2
-                data[yind]=Y2
-                data[zind]=Z2
-                data[3+xind]=X1
-                data[3+yind]=Y1
-                data[3+zind]=Z1
-                new_lines.insert(0, data)
-        
+        for i in range(steps):
+            X2 = pts[2*i]
+            Y2 = pts[2*i+1]
+            Z2 = p1[zind] + dz*(i+1)
+            data = [0.0,0.0,0.0,0.0,0.0,0.0]
+            data[xind]=X1
+            data[yind]=Y1
+            data[zind]=Z1
+            data[3+xind]=X2
+            data[3+yind]=Y2
+            data[3+zind]=Z2
+            new_lines.append(data)
             X1=X2
             Y1=Y2
             Z1=Z2
-            at = at+arc_step
+        new_lines[-1][3+zind] = p2[zind]
 
         return new_lines
     
@@ -1614,394 +1551,11 @@ class G_Code_Rip:
     #######################################    #######################################
     #######################################    #######################################
 
-    def FUNCTION_EVAL(self,list):
-        #list consists of [name,val1,val2]
-        name = list[0]
-        val1 = float(list[1])
-        fval = float(val1)
-        #############################################
-        ########### G-CODE FUNCTIONS ################
-        #############################################
-        # ATAN[Y]/[X] Four quadrant inverse tangent #
-        # ABS[arg]    Absolute value                #
-        # ACOS[arg]   Inverse cosine                #
-        # ASIN[arg]   Inverse sine                  #
-        # COS[arg]    Cosine                        #
-        # EXP[arg]    e raised to the given power   #
-        # FIX[arg]    Round down to integer         #
-        # FUP[arg]    Round up to integer           #
-        # ROUND[arg]  Round to nearest integer      #
-        # LN[arg]     Base-e logarithm              #
-        # SIN[arg]    Sine                          #
-        # SQRT[arg]   Square Root                   #
-        # TAN[arg]    Tangent                       #
-        # EXISTS[arg]	Check named Parameter   #
-        #############################################
-        if name == "ATAN":
-            fval2 = float(list[2])
-            atan2(fval1,fval2)
-        if name == "ABS":
-            return abs(fval)
-        if name == "ACOS":
-            return degrees(acos(fval))
-        if name == "ASIN":
-            return degrees(asin(fval))
-        if name == "COS":
-            return cos(radians(fval))
-        if name == "EXP":
-            return exp(fval)
-        if name == "FIX":
-            return floor(fval)
-        if name == "FUP":
-            return ceil(fval)
-        if name == "ROUND":
-            return round(fval)
-        if name == "LN":
-            return log(fval)
-        if name == "SIN":
-            return sin(radians(fval))
-        if name == "SQRT":
-            return sqrt(fval)
-        if name == "TAN":
-            return tan(radians(fval))
-        if name == "EXISTS":
-            pass
-        
     def EXPRESSION_EVAL(self,line):
-        ###################################################
-        ###          EVALUATE MATH IN REGION            ###
-        ###################################################
-        line_in = line
-        P = 0
-        if P==1: self.fmessage("line=%s" %(line))
-
-        if len(line)<2:
-            MSG = "ERROR EXP-1: Unable to evaluate expression: %s\n" %(line_in)
-            raise ValueError(MSG)
-        
-        
-        line = line.replace(" ","")
-        
-        #################################################
-        ###           G-CODE OPPERATORS               ###
-        ###          In Precedence Order              ###
-        #################################################
-        ##    **                                        #
-        ##    * / MOD                                   #
-        ##    + -                                       #
-        ##    EQ NE GT GE LT LE                         #
-        ##    AND OR XOR                                #
-        #################################################
-
-        #################################################
-        ### Replace multiple +/- with single operator ###
-        #################################################
-        cnt = 1
-        while cnt > 0:
-            if (not self.cmp_new(line[cnt],'+')) or (not self.cmp_new(line[cnt],'-')):
-                sign = 1
-                span = 0
-                FLAG = True
-                while FLAG:
-                    if not self.cmp_new(line[cnt+span],'+'):
-                        span = span + 1
-                    elif not self.cmp_new(line[cnt+span],'-'):
-                        sign = -sign
-                        span = span + 1
-                    else:
-                        FLAG = False
-                tmp1=line[:(cnt)]
-                tmp2=line[(cnt+span):]
-                if sign > 0:
-                    line = tmp1+'+'+tmp2
-                else:
-                    line = tmp1+'-'+tmp2    
-            cnt=cnt + 1
-            if cnt >= len(line):
-                cnt = -1
-                
-        #########################################
-        ### Replace multi-character operators ###
-        ### with single character identifiers ###
-        #########################################
-        line = line.replace("XOR","|")
-        line = line.replace("AND","&")
-        line = line.replace("LE","l")
-        line = line.replace("LT","<")
-        line = line.replace("GE","g")
-        line = line.replace("GT",">")
-        line = line.replace("NE","!")
-        line = line.replace("EQ","=")
-        line = line.replace("**","^")
-
-        #########################################
-        ###     Split the text into a list    ###
-        #########################################
-        line = re.split( "([\[,\],\^,\*,\/,\%,\+,\-,\|  ,\&  ,\l ,\< ,\g ,\> ,\! ,\= ])", line)
-        
-        #########################################
-        ### Remove empty items from the list  ###
-        #########################################
-        for i in range(line.count('')): line.remove('')
-        
-        #########################################
-        ###   Find the last "[" in the list   ###
-        #########################################
-        s=-1
-        for cnt in range(s+1,len(line)):
-            if line[cnt] == '[':
-                s = cnt
-        if s == -1:
-            MSG = "ERROR EXP-2: Unable to evaluate expression: %s" %(line_in)
-            #self.fmessage(MSG)
-            raise ValueError(MSG)
-        
-        #################################################################    
-        ###  While there are still brackets "[...]" keep processing   ###
-        #################################################################
-        while s != -1:
-            ##############################################################
-            ### Find the first occurance of "]" after the current "["  ###
-            ##############################################################
-            e=-1
-            for cnt in range(len(line)-1,s,-1):
-                if line[cnt] == ']':
-                    e = cnt
-                    
-            #############################################
-            ###  Find the items between the brackets  ###
-            #############################################
-            temp = line[s+1:e]
-            
-            ##############################################################
-            ###  Fix Some Special Cases                                ###
-            ##############################################################
-            ### **-  *-  MOD-                                          ###
-            ##############################################################
-            for cnt in range(0,len(temp)):
-                if (not self.cmp_new(temp[cnt],'^')) or \
-                   (not self.cmp_new(temp[cnt],'*')) or \
-                   (not self.cmp_new(temp[cnt],'%')):
-                    if not self.cmp_new(temp[cnt+1],'-'):
-                        temp[cnt+1]=''
-                        temp[cnt+2]= -float(temp[cnt+2])
-                    elif not self.cmp_new(temp[cnt+1],'+'):
-                        temp[cnt+1]=''
-                        temp[cnt+2]= float(temp[cnt+2])
-            for i in range(temp.count('')): temp.remove('')
-
-            #####################################
-            XOR_operation = self.list_split(temp,"|") #XOR
-            for iXOR in range(0,len(XOR_operation)):
-                #####################################
-                AND_operation = self.list_split(XOR_operation[iXOR],"&") #AND
-                for iAND in range(0,len(AND_operation)):
-                    #####################################
-                    LE_operation = self.list_split(AND_operation[iAND],"l") #LE
-                    for iLE in range(0,len(LE_operation)):
-                        #####################################
-                        LT_operation = self.list_split(LE_operation[iLE],"<") #LT
-                        for iLT in range(0,len(LT_operation)):
-                            #####################################
-                            GE_operation = self.list_split(LT_operation[iLT],"g") #GE
-                            for iGE in range(0,len(GE_operation)):
-                                #####################################
-                                GT_operation = self.list_split(GE_operation[iGE],">") #GT
-                                for iGT in range(0,len(GT_operation)):
-                                    #####################################
-                                    NE_operation = self.list_split(GT_operation[iGT],"!") #NE
-                                    for iNE in range(0,len(NE_operation)):
-                                        #####################################
-                                        EQ_operation = self.list_split(NE_operation[iNE],"=") #EQ
-                                        for iEQ in range(0,len(EQ_operation)):
-                                            #####################################
-                                            add = self.list_split(EQ_operation[iEQ],"+")
-                                            for cnt in range(1,len(add)):
-                                                if add[cnt-1]==[]:
-                                                    add[cnt-1]  = ''
-                                            for i in range(add.count('')): add.remove('')      
-                                            for iadd in range(0,len(add)):
-                                                #####################################
-                                                subtract = self.list_split(add[iadd],"-")         
-                                                for cnt in range(1,len(subtract)):
-                                                    if subtract[cnt-1]==[]:
-                                                        subtract[cnt-1]  = ''
-                                                        subtract[cnt][0] = -float(subtract[cnt][0])
-                                                for i in range(subtract.count('')): subtract.remove('')
-                                                for isub in range(0,len(subtract)):
-                                                    #####################################
-                                                    multiply = self.list_split(subtract[isub],"*")
-                                                    for imult in range(0,len(multiply)):
-                                                        #####################################
-                                                        divide = self.list_split(multiply[imult],"/")
-                                                        for idiv in range(0,len(divide)):
-                                                            #####################################
-                                                            mod = self.list_split(divide[idiv],"%")
-                                                            for imod in range(0,len(mod)):
-                                                                #####################################
-                                                                power = self.list_split(mod[imod],"^")
-                                                                for ipow in range(0,len(power)):
-                                                                    if power[ipow]==[]:
-                                                                        MSG = "ERROR EXP-3: Unable to evaluate expression: %s" %(line_in)
-                                                                        raise ValueError(MSG)
-                                                                    
-                                                                    if type(power[0]) is list:
-                                                                        power_len = len(power[0])
-                                                                    else:
-                                                                        power_len = 1
-                                                                    if power_len > 1:
-                                                                        power[ipow] = self.FUNCTION_EVAL(power[0])
-                                                                    else:
-                                                                        power[ipow] = float(power[ipow][0])
-                                                                #####################################
-                                                                res_power=power[0]
-                                                                for k in range(1,len(power)):
-                                                                    res_power = res_power**power[k]
-                                                                    if P==True: self.fmessage("  POWER"+str(power)+"="+str(res_power))
-                                                                mod[imod]=res_power
-                                                            #####################################
-                                                            #REVERSE MOD
-                                                            res_mod=mod[len(mod)-1]
-                                                            for k in range(len(mod),1,-1):
-                                                                res_mod = mod[k-2]%res_mod
-                                                                self.fmessage("     MOD"+str(mod)+"="+str(res_mod))
-                                                            divide[idiv]=res_mod
-                                                        #####################################
-                                                        res_divide=divide[0]
-                                                        for k in range(1,len(divide),1):
-                                                            res_divide = res_divide/divide[k]
-                                                            if P==True: self.fmessage("  DIVIDE"+str(divide)+"="+str(res_divide))
-                                                        multiply[imult]=res_divide
-                                                    #####################################
-                                                    res_multiply=multiply[0]
-                                                    for k in range(1,len(multiply)):
-                                                        res_multiply = res_multiply*multiply[k]
-                                                        if P==True: self.fmessage("MULTIPLY"+str(multiply)+"="+str(res_multiply))         
-                                                    subtract[isub]=res_multiply
-                                                #####################################
-                                                res_subtract=subtract[0]
-                                                for k in range(1,len(subtract)):
-                                                    res_subtract = res_subtract-subtract[k]
-                                                    if P==True: self.fmessage("SUBTRACT"+str(subtract)+"="+str(res_subtract))
-                                                add[iadd]=res_subtract
-                                            #####################################
-                                            res_add=add[len(add)-1]
-                                            for k in range(len(add),1,-1):
-                                                res_add = add[k-2]+res_add
-                                                if P==True: self.fmessage("     ADD"+str(add)+"="+str(res_add))
-                                            EQ_operation[iEQ]=res_add
-                                        #####################
-                                        res_EQ=EQ_operation[0]
-                                        for k in range(1,len(EQ_operation),1):
-                                            if res_EQ == EQ_operation[k]:
-                                                res_EQ = 1
-                                            else:
-                                                res_EQ = 0
-                                            if P==True: self.fmessage("      EQ"+str(EQ_operation)+"="+str(res_EQ))
-                                        NE_operation[iNE]=res_EQ
-                                    #####################
-                                    res_NE=NE_operation[0]
-                                    for k in range(1,len(NE_operation),1):
-                                        if res_NE != NE_operation[k]:
-                                            res_NE = 1
-                                        else:
-                                            res_NE = 0
-                                        if P==True: self.fmessage("      NE"+str(NE_operation)+"="+str(res_NE))
-                                    GT_operation[iGT]=res_NE
-                                #####################
-                                res_GT=GT_operation[0]
-                                for k in range(1,len(GT_operation),1):
-                                    if res_GT > GT_operation[k]:
-                                        res_GT = 1
-                                    else:
-                                        res_GT = 0
-                                    if P==True: self.fmessage("      GT"+str(GT_operation),"="+str(res_GT))
-                                GE_operation[iGE]=res_GT
-                            #####################
-                            res_GE=GE_operation[0]
-                            for k in range(1,len(GE_operation),1):
-                                if res_GE >= GE_operation[k]:
-                                    res_GE = 1
-                                else:
-                                    res_GE = 0
-                                if P==True: self.fmessage("      GE"+str(GE_operation)+"="+str(res_GE))
-                            LT_operation[iLT]=res_GE
-                        #####################
-                        res_LT=LT_operation[0]
-                        for k in range(1,len(LT_operation),1):
-                            if res_LT < LT_operation[k]:
-                                res_LT = 1
-                            else:
-                                res_LT = 0
-                            if P==True: self.fmessage("      LT"+str(LT_operation)+"="+str(res_LT))
-                        LE_operation[iLE]=res_LT
-                    #####################
-                    res_LE=LE_operation[0]
-                    for k in range(1,len(LE_operation),1):
-                        if res_LE <= LE_operation[k]:
-                            res_LE = 1
-                        else:
-                            res_LE = 0
-                        if P==True: self.fmessage("      LE"+str(LE_operation)+"="+str(res_LE))
-                    AND_operation[iAND]=res_LE
-                #####################
-                res_AND=AND_operation[0]
-                for k in range(1,len(AND_operation),1):
-                    if res_AND and AND_operation[k]:
-                        res_AND = 1
-                    else:
-                        res_AND = 0
-                    if P==True: self.fmessage("      AND"+str(AND_operation)+"="+str(res_AND))
-                XOR_operation[iXOR]=res_AND
-            #####################
-            res_XOR=XOR_operation[0]
-            for k in range(1,len(XOR_operation),1):
-                if bool(res_XOR) ^ bool(XOR_operation[k]):
-                    res_XOR = 1
-                else:
-                    res_XOR = 0
-                if P==True: self.fmessage("      XOR"+str(XOR_operation)+"="+str(res_XOR))
-
-            #####################################
-            ### Return NEW VALUE to the list  ###
-            #####################################
-            for i in range(e,s-1,-1): line.pop(i)
-            line.insert(int(s),res_XOR)
-
-            #############################
-            # Find Last "[" in the list #
-            #############################
-            s=-1
-            for cnt in range(s+1,len(line)):
-                if line[cnt] == '[':
-                    s = cnt
-        #################################################################    
-        ###  END of While there are still brackets "[...]"            ###
-        #################################################################
-        
-        if len(line) > 1:
-            MSG = "ERROR EXP-5: Unable to evaluate expression: %s" %(line_in)
-            raise ValueError(MSG)
-        return "%.4f" %(line[0])
-
-
-    def list_split(self,lst,obj):
-        loc=[]
-        index = -1
-        for cnt in range(0,len(lst)):
-            if not self.cmp_new(lst[cnt],obj):
-                loc.append( lst[index+1:cnt] )
-                index=cnt
-        loc.append( lst[index+1:len(lst)])
-        return loc
-
-
-    #Define self.cmp_new, cmp replacement for Python 3 compatability
-    def cmp_new(self,A,B):
-        if A==B:
-            return False
-        else:
-            return True
+        # Evaluate a math region like "[#1*2]" against the parameters
+        # set so far, the result is text ready to put back in the line
+        return "%.4f" %(evaluate(line, self.variables))
+
 
     ############################################################################
     # routine takes an x and a y coords and does a cordinate transformation    #
@@ -2029,7 +1583,11 @@ class G_Code_Rip:
     ##################################################
     ###  Generate paths for Laser cutter           ###
     ##################################################
-    def generate_laser_paths(self, side, Rapids=True, spindle_power_scale=1.0):
+    def generate_laser_paths(self, side, Rapids=True, spindle_power_scale=1.0, keep_arcs=False):
+        # XY arcs come out as straight segments unless keep_arcs is set.
+        # Then each arc is one point with the centre and the direction on
+        # the end: [x, y, loop, feed, spindle, cx, cy, code], code 2 is
+        # clockwise and 3 is counter clockwise.
         ecoords = []
         #################################
         xlast = -99999
@@ -2040,9 +1598,9 @@ class G_Code_Rip:
 
         for line in side:
             #print line
-            if line[0] == 1:
-                feed    = line[3] * in_per_min_to_mm_per_sec
-                spindle = line[4] * spindle_power_scale
+            if line[0] == 1 or line[0] == 2 or line[0] == 3:
+                feed    = line[-2] * in_per_min_to_mm_per_sec
+                spindle = line[-1] * spindle_power_scale
                 x1=(line[1][0]+0j).real
                 y1=(line[1][1]+0j).real
                 z1=(line[1][2]+0j).real
@@ -2050,13 +1608,22 @@ class G_Code_Rip:
                 x2=(line[2][0]+0j).real
                 y2=(line[2][1]+0j).real
                 z2=(line[2][2]+0j).real
-    
+
                 if xlast!=x1 or ylast!=y1:
                     loop = loop+1
                     ecoords.append([x1,y1,loop,feed,spindle])
-                    
-                if x2!=x1 or y2!=y1:
-                    ecoords.append([x2,y2,loop,feed,spindle])
+
+                if line[0] == 1:
+                    if x2!=x1 or y2!=y1:
+                        ecoords.append([x2,y2,loop,feed,spindle])
+                else:
+                    cx=(line[3][0]+0j).real
+                    cy=(line[3][1]+0j).real
+                    if keep_arcs:
+                        ecoords.append([x2,y2,loop,feed,spindle,cx,cy,line[0]])
+                    else:
+                        for XY in self.arc2lines([x1,y1,z1],[x2,y2,z2],[cx,cy,0.0],line[0]):
+                            ecoords.append([XY[3],XY[4],loop,feed,spindle])
 
                 xlast = x2
                 ylast = y2
@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+'''
+On-disk cache of prepared job artifacts for K40 Whisperer
+
+Copyright (C) 2024 whodafloater
+
+MIT license
+
+Entries are content addressed. The key is a sha256 over the design
+file bytes plus every parameter that changes the prepared result
+(dpi, raster step, mirror/rotate/negate, halftone, scale ...).
+Changing a setting simply selects a different entry, so nothing ever
+has to be invalidated.
+
+Two kinds of entries are stored:
+    ecoords   [x, y, loop] or [x, y, loop, feed, pow] lists
+              packed as doubles
+    blob      already encoded EGV bytes or G-code text
+
+Every entry is zlib compressed. The file mtime is the LRU clock:
+a hit touches the file and a store evicts the oldest entries until
+the directory is back under max_bytes.
+'''
+
+import os
+import json
+import zlib
+import struct
+import hashlib
+from array import array
+from sys import byteorder as sys_byteorder
+
+from k40_log import get_logger
+
+log = get_logger('cache')
+
+MAGIC = b'K40C'
+FORMAT_VERSION = 1
+
+KIND_ECOORDS = 1
+KIND_BLOB    = 2
+
+# fills the missing fields of short points in data keys, NaN so it
+# never matches a real value
+PAD = float('nan')
+
+# magic, format version, kind, ecoord width, number of ecoords, meta length
+HEADER = struct.Struct('<4sBBBxII')
+
+
+class JobCache:
+    def __init__(self, cache_dir=None, max_bytes=256*1024*1024):
+        if cache_dir == None:
+            cache_dir = os.path.join(os.path.expanduser("~"), ".k40xw_cache")
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = True
+
+        self.hits = 0
+        self.misses = 0
+
+        # (path, size, mtime) -> digest, so a big design is only hashed once
+        self.__file_digests = {}
+
+    ##########################################################################
+    # keys
+    ##########################################################################
+    def file_digest(self, filename):
+        '''sha256 of a file's bytes, memoized on path, size and mtime'''
+        st = os.stat(filename)
+        stamp = (os.path.abspath(filename), st.st_size, st.st_mtime_ns)
+        digest = self.__file_digests.get(stamp)
+        if digest != None:
+            return digest
+
+        h = hashlib.sha256()
+        with open(filename, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self.__file_digests[stamp] = digest
+        return digest
+
+    def key(self, stage, filename=None, parent=None, digest=None, **params):
+        '''Build a cache key for a pipeline stage
+
+           stage    name of the artifact, 'raster', 'raster_egv' ...
+           filename design file whose bytes feed the key
+           parent   key of the artifact this one is derived from
+           digest   file_digest() taken when the design was read, use
+                    this instead of filename when the file may have
+                    changed on disk since
+           params   anything else the result depends on
+        '''
+        h = hashlib.sha256()
+        h.update(f'{stage}:{FORMAT_VERSION}'.encode())
+        if digest != None:
+            h.update(digest.encode())
+        elif filename != None:
+            h.update(self.file_digest(filename).encode())
+        if parent != None:
+            h.update(parent.encode())
+        h.update(repr(sorted(params.items())).encode())
+        return h.hexdigest()
+
+    def data_key(self, stage, ecoords, **params):
+        '''Key derived from ecoords content rather than a file'''
+        try:
+            # arc points from fit_arcs have more fields than the
+            # points around them, pad them all to the widest
+            width = max(map(len, ecoords)) if ecoords else 3
+            width, packed = pack_ecoords(ecoords, width)
+        except Exception:
+            width, packed = 0, repr(ecoords).encode()
+        h = hashlib.sha256()
+        h.update(f'{stage}:{FORMAT_VERSION}:{width}'.encode())
+        h.update(packed)
+        h.update(repr(sorted(params.items())).encode())
+        return h.hexdigest()
+
+    ##########################################################################
+    # ecoords entries
+    ##########################################################################
+    def get_ecoords(self, key):
+        '''Return (ecoords, meta) or None on a miss'''
+        entry = self.__load(key, KIND_ECOORDS)
+        if entry == None:
+            return None
+        width, count, meta, payload = entry
+        return unpack_ecoords(payload, width, count), meta
+
+    def put_ecoords(self, key, ecoords, meta=None):
+        width, packed = pack_ecoords(ecoords)
+        self.__store(key, KIND_ECOORDS, width, len(ecoords), meta, packed)
+
+    ##########################################################################
+    # encoded output entries
+    ##########################################################################
+    def get_blob(self, key):
+        '''Return (bytes, meta) or None on a miss'''
+        entry = self.__load(key, KIND_BLOB)
+        if entry == None:
+            return None
+        width, count, meta, payload = entry
+        return payload, meta
+
+    def put_blob(self, key, data, meta=None):
+        if not isinstance(data, (bytes, bytearray)):
+            data = bytes(data)
+        self.__store(key, KIND_BLOB, 0, len(data), meta, data)
+
+    def get_egv(self, key):
+        '''EGV data comes back as the list of ints the encoder makes'''
+        entry = self.get_blob(key)
+        if entry == None:
+            return None
+        return list(entry[0]), entry[1]
+
+    def get_gcode(self, key):
+        '''G-code comes back as a list of lines'''
+        entry = self.get_blob(key)
+        if entry == None:
+            return None
+        return entry[0].decode().split('\n'), entry[1]
+
+    def put_gcode(self, key, lines, meta=None):
+        self.put_blob(key, '\n'.join(lines).encode(), meta)
+
+    ##########################################################################
+    # housekeeping
+    ##########################################################################
+    def size(self):
+        total = 0
+        for path, st in self.__entries():
+            total = total + st.st_size
+        return total
+
+    def clear(self):
+        for path, st in self.__entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def evict(self, max_bytes=None):
+        '''Drop least recently used entries until under max_bytes'''
+        if max_bytes == None:
+            max_bytes = self.max_bytes
+        entries = self.__entries()
+        total = 0
+        for path, st in entries:
+            total = total + st.st_size
+        if total <= max_bytes:
+            return
+
+        entries.sort(key=lambda e: e[1].st_mtime_ns)
+        for path, st in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                total = total - st.st_size
+                log.debug('evicted %s', os.path.basename(path))
+            except OSError:
+                pass
+
+    def __entries(self):
+        entries = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith('.k40c'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                entries.append((path, os.stat(path)))
+            except OSError:
+                pass
+        return entries
+
+    def __path(self, key):
+        return os.path.join(self.cache_dir, key + '.k40c')
+
+    def __load(self, key, kind):
+        if not self.enabled:
+            return None
+        path = self.__path(key)
+        try:
+            with open(path, 'rb') as f:
+                raw = f.read()
+        except OSError:
+            self.misses = self.misses + 1
+            return None
+
+        try:
+            magic, version, ekind, width, count, meta_len = HEADER.unpack_from(raw)
+            if magic != MAGIC or version != FORMAT_VERSION or ekind != kind:
+                raise ValueError('bad cache header')
+            body = zlib.decompress(raw[HEADER.size:])
+            meta = json.loads(body[:meta_len].decode()) if meta_len else {}
+            payload = body[meta_len:]
+        except Exception as e:
+            log.warning('dropping unreadable cache entry %s: %s', path, e)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.misses = self.misses + 1
+            return None
+
+        # touch for LRU
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits = self.hits + 1
+        log.debug('hit %s', key)
+        return width, count, meta, payload
+
+    def __store(self, key, kind, width, count, meta, payload):
+        if not self.enabled:
+            return
+        meta_raw = json.dumps(meta).encode() if meta else b''
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, kind, width, count, len(meta_raw))
+        body = zlib.compress(meta_raw + bytes(payload), 1)
+
+        path = self.__path(key)
+        tmp = path + f'.{os.getpid()}.tmp'
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp, 'wb') as f:
+                f.write(header)
+                f.write(body)
+            os.replace(tmp, path)
+        except OSError as e:
+            log.warning('unable to write cache entry %s: %s', path, e)
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        log.debug('stored %s %d bytes', key, len(header)+len(body))
+        self.evict()
+
+
+def pack_ecoords(ecoords, width=None):
+    '''Pack an ecoords list into little endian doubles
+
+       All points must have the same number of fields, 3 for
+       [x, y, loop] or 5 for [x, y, loop, feed, pow]. With width
+       shorter points are padded with NaN up to width fields instead.
+    '''
+    if len(ecoords) == 0:
+        return (width or 3), b''
+    flat = array('d')
+    if width == None:
+        width = len(ecoords[0])
+        for pt in ecoords:
+            if len(pt) != width:
+                raise Exception("ecoords have mixed point sizes, unable to cache")
+            flat.extend(pt)
+    else:
+        pads = [[PAD]*n for n in range(width+1)]
+        for pt in ecoords:
+            flat.extend(pt)
+            flat.extend(pads[width-len(pt)])
+    if sys_byteorder != 'little':
+        flat.byteswap()
+    return width, flat.tobytes()
+
+
+def unpack_ecoords(payload, width, count):
+    flat = array('d')
+    flat.frombytes(payload)
+    if sys_byteorder != 'little':
+        flat.byteswap()
+    if len(flat) != width*count:
+        raise Exception("cached ecoords are truncated")
+    ecoords = []
+    for i in range(0, len(flat), width):
+        pt = flat[i:i+width].tolist()
+        # loop ids are ints everywhere else
+        pt[2] = int(pt[2])
+        ecoords.append(pt)
+    return ecoords
+
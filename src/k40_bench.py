@@ -0,0 +1,476 @@
+#!/usr/bin/env python
+'''
+Pipeline benchmarks for K40 Whisperer
+
+Copyright (C) 2024 whodafloater
+
+MIT license
+
+Times each preparation stage on its own, over the files in ../test
+and over synthetic designs scaled up by --scale:
+
+    dxf_parse     DXF_CLASS.PARSE_DXF_DATA + MAKE_DXF_COORDS + DXF_COORDS_GET_TYPE
+    svg_parse     SVG_READER.parse_svg + make_paths
+    gcode_parse   G_Code_Rip.Read_G_Code + generate_laser_paths
+    raster        make_raster_coords
+    path_sort     optimize_paths
+    egv_encode    egv.make_egv_data (vector, raster and variable feed)
+    gcode_encode  xtool_CLASS.ecoord_to_gcode
+    packetize     K40_CLASS.send_data packet and CRC generation
+    egv_parse     EgvParser.tokenize, and the byte at a time
+                  EgvParser.parse_stream it replaces for reference
+
+Stages whose libraries are not installed are reported as skipped.
+
+Usage:
+    python3 k40_bench.py [options]
+
+    --scale, -s N     synthetic size multiplier              default 1
+    --repeat, -r N    timed runs per case, best is kept      default 3
+    --only STAGE,...  run only these stages
+    --json FILE       write results as JSON
+    --baseline FILE   compare with a stored run, exit 1 on regression
+    --save-baseline FILE  store this run as the baseline
+    --tolerance F     allowed slow down, 0.25 is 25%         default 0.25
+    --help, -h        print this help
+'''
+
+import sys
+import os
+import io
+import json
+import math
+import getopt
+import platform
+import tempfile
+from time import perf_counter, strftime
+
+from egv import egv
+from dxf import DXF_CLASS
+from g_code_library import G_Code_Rip
+from nano_library import K40_CLASS
+from EgvParser import EgvParser
+
+SVG=True
+try:
+    from svg_reader import SVG_READER
+except Exception as e:
+    print(f"Unable to load svg_reader ({e}), svg_parse is skipped")
+    SVG=False
+
+HEADLESS=True
+try:
+    import k40_whisperer
+    from k40_headless import HeadlessJob
+    from PIL import Image, ImageDraw
+except Exception as e:
+    print(f"Unable to load k40_headless ({e}), raster and path_sort are skipped")
+    HEADLESS=False
+
+XTOOL=True
+try:
+    from xtool_lib import xtool_CLASS
+except Exception as e:
+    print(f"Unable to load xtool_lib ({e}), gcode_encode is skipped")
+    XTOOL=False
+
+TEST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test')
+
+# differences below this are timer noise, never a regression
+NOISE_FLOOR = 0.002
+
+
+##############################################################################
+# synthetic designs
+##############################################################################
+def synth_dxf(n):
+    '''n rows of parts, each a rectangle of LINEs, a CIRCLE, an ARC
+       and a bulged LWPOLYLINE, in inches
+    '''
+    out = ['0', 'SECTION', '2', 'HEADER', '9', '$INSUNITS', '70', '1',
+           '0', 'ENDSEC', '0', 'SECTION', '2', 'ENTITIES']
+    for i in range(n):
+        for j in range(10):
+            x = j*1.5
+            y = i*1.5
+            for x1, y1, x2, y2 in ((x, y, x+1, y), (x+1, y, x+1, y+1),
+                                   (x+1, y+1, x, y+1), (x, y+1, x, y)):
+                out += ['0', 'LINE', '8', 'CUT', '62', '1',
+                        '10', f'{x1}', '20', f'{y1}', '30', '0',
+                        '11', f'{x2}', '21', f'{y2}', '31', '0']
+            out += ['0', 'CIRCLE', '8', 'CUT', '62', '1',
+                    '10', f'{x+0.5}', '20', f'{y+0.5}', '30', '0', '40', '0.25']
+            out += ['0', 'ARC', '8', 'ENGRAVE', '62', '5',
+                    '10', f'{x+0.5}', '20', f'{y+0.5}', '30', '0', '40', '0.4',
+                    '50', '10', '51', '170']
+            out += ['0', 'LWPOLYLINE', '8', 'ENGRAVE', '62', '5', '90', '3', '70', '0',
+                    '10', f'{x+0.1}', '20', f'{y+0.1}', '42', '0.5',
+                    '10', f'{x+0.3}', '20', f'{y+0.1}',
+                    '10', f'{x+0.3}', '20', f'{y+0.3}']
+    out += ['0', 'ENDSEC', '0', 'EOF']
+    return '\n'.join(out) + '\n'
+
+
+def synth_svg(n):
+    '''n rows of red (cut) and blue (engrave) cubic paths, in mm'''
+    out = ['<?xml version="1.0" encoding="UTF-8"?>',
+           f'<svg xmlns="http://www.w3.org/2000/svg" width="200mm" height="{n*12+10}mm"'
+           f' viewBox="0 0 200 {n*12+10}">']
+    for i in range(n):
+        for j in range(15):
+            x = j*12+5
+            y = i*12+5
+            out.append(f'<path d="M {x} {y} C {x+10} {y} {x+10} {y+10} {x} {y+10} Z"'
+                       f' style="fill:none;stroke:#ff0000;stroke-width:0.1"/>')
+            out.append(f'<path d="M {x+2} {y+5} Q {x+5} {y} {x+8} {y+5}"'
+                       f' style="fill:none;stroke:#0000ff;stroke-width:0.1"/>')
+    out.append('</svg>')
+    return '\n'.join(out) + '\n'
+
+
+def synth_gcode(n):
+    '''n rows of parts cut with G1 lines and G2/G3 arcs, in mm'''
+    out = ['G21', 'G90', 'G0 F3000', 'G1 F600', 'M3 S1000']
+    for i in range(n):
+        for j in range(10):
+            x = j*30
+            y = i*30
+            out.append(f'G0 X{x:.3f} Y{y:.3f}')
+            out.append(f'G1 X{x+20:.3f} Y{y:.3f} F{600+j*10}')
+            out.append(f'G3 X{x+20:.3f} Y{y+20:.3f} I0 J10')
+            out.append(f'G1 X{x:.3f} Y{y+20:.3f}')
+            out.append(f'G2 X{x:.3f} Y{y:.3f} I0 J-10')
+    out += ['M5', 'M2']
+    return '\n'.join(out) + '\n'
+
+
+def synth_ecoords(n, feed=None, power=None):
+    '''n rows of ten 16-gons, the shape of a typical vector import'''
+    ecoords = []
+    loop = 0
+    for i in range(n):
+        for j in range(10):
+            loop = loop + 1
+            for k in range(17):
+                a = 2*math.pi*k/16
+                pt = [j*0.5 + 0.2*math.cos(a), i*0.5 + 0.2*math.sin(a), loop]
+                if feed != None:
+                    pt = pt + [feed, power]
+                ecoords.append(pt)
+    return ecoords
+
+
+def synth_raster_ecoords(n):
+    '''Scan lines in the layout make_raster_coords produces'''
+    ecoords = []
+    loop = 1
+    step = 0.004
+    for i in range(n*25):
+        y = (n*25 - i)*step
+        x = 0.0
+        for k in range(20):
+            x = x + 0.05 + 0.01*((i+k) % 5)
+            loop = loop + 1
+            ecoords.append([x, y, loop])
+            ecoords.append([x+0.03, y, loop])
+    return ecoords
+
+
+def synth_image(n):
+    im = Image.new('L', (1000, n*100), 255)
+    draw = ImageDraw.Draw(im)
+    for i in range(n):
+        for j in range(8):
+            x = j*120 + 20
+            y = i*100 + 10
+            draw.ellipse((x, y, x+80, y+80), fill=(j*30) % 200)
+    return im
+
+
+##############################################################################
+# stages
+##############################################################################
+class Case:
+    def __init__(self, stage, name, setup, run):
+        self.stage = stage
+        self.name = name
+        self.setup = setup      # () -> state, not timed
+        self.run = run          # (state) -> item count, timed
+
+
+def write_temp(text, suffix, tmpdir):
+    fname = os.path.join(tmpdir, 'synth' + suffix)
+    with open(fname, 'w') as f:
+        f.write(text)
+    return fname
+
+
+def dxf_parse(fname):
+    dxf_import = DXF_CLASS()
+    with open(fname) as fd:
+        dxf_import.PARSE_DXF_DATA(fd)
+    dxf_import.MAKE_DXF_COORDS(lin_tol=0.0005)
+    eng = dxf_import.DXF_COORDS_GET_TYPE(engrave=True, new_origin=False)
+    cut = dxf_import.DXF_COORDS_GET_TYPE(engrave=False, new_origin=False)
+    return (len(eng) + len(cut))//4
+
+
+def svg_parse(fname):
+    svg_reader = SVG_READER()
+    svg_reader.image_dpi = 1000
+    svg_reader.parse_svg(fname)
+    svg_reader.make_paths()
+    return len(svg_reader.cut_lines) + len(svg_reader.eng_lines)
+
+
+def gcode_parse(fname):
+    g_rip = G_Code_Rip()
+    g_rip.Read_G_Code(fname, XYarc2line=True, arc_angle=2, units="in", Accuracy="")
+    return len(g_rip.generate_laser_paths(g_rip.g_code_data))
+
+
+def egv_encode(ecoords, Feed, Raster_step=0):
+    data = []
+    egv(target=data.append).make_egv_data(ecoords, startX=0, startY=0,
+                                          Feed=Feed, board_name="LASER-M2",
+                                          Raster_step=Raster_step)
+    return len(data)
+
+
+def packetize(data):
+    nano = BenchK40()
+    nano.send_data(data[:], preprocess_crc=True)
+    return nano.packets
+
+
+def egv_parse(data):
+    return sum(len(commands) for commands, distances, numbers in EgvParser().tokenize(data))
+
+
+def egv_parse_stream(data):
+    return sum(1 for token in EgvParser().parse_stream(io.BytesIO(data)))
+
+
+class BenchK40(K40_CLASS):
+    '''Counts packets instead of writing them to USB'''
+    def __init__(self):
+        K40_CLASS.__init__(self)
+        self.packets = 0
+
+    def send_packet_w_error_checking(self, line, update_gui=None, stop_calc=None):
+        self.packets = self.packets + 1
+
+
+def headless_job():
+    k40_whisperer.HEADLESS = True
+    job = HeadlessJob()
+    job.use_job_cache.set(0)
+    return job
+
+
+def raster_setup(image):
+    def setup():
+        job = headless_job()
+        return job, image()
+    return setup
+
+
+def raster_run(state):
+    job, image = state
+    job.RengData.set_image(image)
+    job.input_dpi = 1000.0
+    job.make_raster_coords()
+    return len(job.RengData.ecoords)
+
+
+def make_cases(scale, tmpdir):
+    cases = []
+    fixture = lambda name: os.path.join(TEST_DIR, name)
+    n = 10*scale
+
+    for name, fname in (('Drawing1.DXF', lambda: fixture('Drawing1.DXF')),
+                        (f'synth{n}', lambda: write_temp(synth_dxf(n), '.dxf', tmpdir))):
+        cases.append(Case('dxf_parse', name, fname, dxf_parse))
+
+    if SVG:
+        cases.append(Case('svg_parse', f'synth{n}',
+                          lambda: write_temp(synth_svg(n), '.svg', tmpdir), svg_parse))
+
+    for name, fname in (('myshape.gcode', lambda: fixture('myshape.gcode')),
+                        (f'synth{n}', lambda: write_temp(synth_gcode(n), '.ngc', tmpdir))):
+        cases.append(Case('gcode_parse', name, fname, gcode_parse))
+
+    if HEADLESS:
+        cases.append(Case('raster', 'frog.png',
+                          raster_setup(lambda: Image.open(fixture('frog.png'))), raster_run))
+        cases.append(Case('raster', f'synth{n}',
+                          raster_setup(lambda: synth_image(n)), raster_run))
+        cases.append(Case('path_sort', f'synth{n}',
+                          lambda: (headless_job(), synth_ecoords(n)),
+                          lambda s: len(s[0].optimize_paths(s[1]))))
+
+    cases.append(Case('egv_encode', f'vector{n}',
+                      lambda: synth_ecoords(n), lambda e: egv_encode(e, 20)))
+    cases.append(Case('egv_encode', f'raster{n}',
+                      lambda: synth_raster_ecoords(n), lambda e: egv_encode(e, 100, -4)))
+    cases.append(Case('egv_encode', f'variable_feed{n}',
+                      lambda: synth_ecoords(n, feed=600, power=1000), lambda e: egv_encode(e, None)))
+
+    if XTOOL:
+        cases.append(Case('gcode_encode', f'vector{n}',
+                          lambda: (xtool_CLASS(), synth_ecoords(n, feed=20, power=50)),
+                          lambda s: len(s[0].ecoord_to_gcode(s[1])[0])))
+
+    def egv_data():
+        data = [ord('I')]
+        egv(target=data.append).make_egv_data(synth_ecoords(n), Feed=20)
+        return data
+    cases.append(Case('packetize', f'vector{n}', egv_data, packetize))
+
+    def egv_bytes(ecoords, Feed, Raster_step=0):
+        def setup():
+            data = []
+            egv(target=data.append).make_egv_data(ecoords(), Feed=Feed, Raster_step=Raster_step)
+            return bytes(data)
+        return setup
+    for name, data in ((f'vector{n}', egv_bytes(lambda: synth_ecoords(n), 20)),
+                       (f'raster{n}', egv_bytes(lambda: synth_raster_ecoords(n), 100, -4))):
+        cases.append(Case('egv_parse', name, data, egv_parse))
+        cases.append(Case('egv_parse', name + '_stream', data, egv_parse_stream))
+    return cases
+
+
+##############################################################################
+# runner
+##############################################################################
+def run_case(case, repeat):
+    state = case.setup()
+    times = []
+    items = 0
+    for i in range(repeat):
+        # stdout is swallowed, some stages print per item
+        saved = sys.stdout
+        sys.stdout = io.StringIO()
+        try:
+            t0 = perf_counter()
+            items = case.run(state)
+            times.append(perf_counter() - t0)
+        finally:
+            sys.stdout = saved
+    times.sort()
+    return {'stage': case.stage,
+            'case': case.name,
+            'items': items,
+            'min': times[0],
+            'median': times[len(times)//2],
+            'runs': repeat}
+
+
+def run_benchmarks(scale=1, repeat=3, only=None):
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for case in make_cases(scale, tmpdir):
+            if only and case.stage not in only:
+                continue
+            try:
+                r = run_case(case, repeat)
+            except Exception as e:
+                r = {'stage': case.stage, 'case': case.name, 'error': f'{e}'}
+            results.append(r)
+            if 'error' in r:
+                print(f"{r['stage']:13s} {r['case']:18s}  FAILED: {r['error']}")
+            else:
+                print(f"{r['stage']:13s} {r['case']:18s} {r['min']*1000:10.2f} ms"
+                      f" {r['items']:9d} items")
+    return {'date': strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'scale': scale,
+            'results': results}
+
+
+def compare(report, baseline, tolerance):
+    '''Return a list of regression messages, empty when all is well'''
+    if baseline.get('scale') != report['scale']:
+        return [f"baseline scale {baseline.get('scale')} does not match run scale {report['scale']}"]
+
+    base = {}
+    for r in baseline['results']:
+        if 'min' in r:
+            base[(r['stage'], r['case'])] = r['min']
+
+    regressions = []
+    for r in report['results']:
+        key = (r['stage'], r['case'])
+        if key not in base:
+            continue
+        if 'error' in r:
+            regressions.append(f'{key[0]} {key[1]}: failed ({r["error"]})')
+            continue
+        old = base[key]
+        new = r['min']
+        if new > old*(1.0+tolerance) and new-old > NOISE_FLOOR:
+            regressions.append(f'{key[0]} {key[1]}: {old*1000:.2f} ms -> {new*1000:.2f} ms'
+                               f' ({100.0*(new/old-1.0):+.0f}%)')
+    return regressions
+
+
+def main(argv):
+    try:
+        opts, args = getopt.getopt(argv, "hs:r:",
+                                   ["help", "scale=", "repeat=", "only=", "json=",
+                                    "baseline=", "save-baseline=", "tolerance="])
+    except getopt.GetoptError as e:
+        print(f'{e}')
+        return 2
+
+    scale = 1
+    repeat = 3
+    only = None
+    json_file = None
+    baseline_file = None
+    save_file = None
+    tolerance = 0.25
+
+    for option, value in opts:
+        if option in ('-h', '--help'):
+            print(__doc__)
+            return 0
+        elif option in ('-s', '--scale'):
+            scale = int(value)
+        elif option in ('-r', '--repeat'):
+            repeat = max(1, int(value))
+        elif option == '--only':
+            only = value.split(',')
+        elif option == '--json':
+            json_file = value
+        elif option == '--baseline':
+            baseline_file = value
+        elif option == '--save-baseline':
+            save_file = value
+        elif option == '--tolerance':
+            tolerance = float(value)
+
+    report = run_benchmarks(scale, repeat, only)
+
+    for fname in (json_file, save_file):
+        if fname != None:
+            with open(fname, 'w') as f:
+                json.dump(report, f, indent=1)
+                f.write('\n')
+
+    if baseline_file != None:
+        with open(baseline_file) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, tolerance)
+        if regressions:
+            print(f'REGRESSION against {baseline_file}:')
+            for msg in regressions:
+                print(f'    {msg}')
+            return 1
+        print(f'No regressions against {baseline_file} (tolerance {100*tolerance:.0f}%)')
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
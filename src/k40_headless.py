@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+'''
+Headless job preparation for K40 Whisperer
+
+Copyright (C) 2024 whodafloater
+
+MIT license
+
+Runs the same load -> raster -> sort -> encode stages as the GUI
+without a display, so batches can be pre-rendered on a server.
+
+Usage:
+    python3 k40_headless.py --settings my.txt [options] design ...
+
+    --settings, -s : settings file as saved by File/Save Settings
+    --format,   -f : egv or gcode (xTool D1)              default egv
+    --ops,      -o : operations, any of Raster_Eng Vector_Eng
+                     Vector_Cut Gcode_Cut joined with '+'  default all
+    --outdir        : output directory                     default .
+                     an output that would overwrite its design gets
+                     _out added to the name
+    --units         : units for unitless DXF files (in, mm, cm)
+                     default is the settings file units
+    --jobs,     -j : worker processes                     default cpu count
+    --help,     -h : print this help
+
+Log levels are taken from the K40_LOG environment variable, for
+example K40_LOG=info,egv=debug
+
+With no design files the designfile from the settings file is used.
+
+The stage code is not duplicated here. HeadlessJob borrows the stage
+methods from k40_whisperer.Application and supplies a Tk free
+settings context plus no-op stand-ins for the few GUI hooks they call.
+'''
+
+import sys
+import os
+import getopt
+import traceback
+from time import time
+from concurrent.futures import ProcessPoolExecutor
+
+import params
+from params import BooleanVar
+from job_cache import JobCache
+import k40_log
+from k40_log import get_logger
+import k40_whisperer
+from k40_whisperer import Application
+
+log = get_logger('headless')
+
+ALL_OPERATIONS = "Raster_Eng+Vector_Eng+Vector_Cut+Gcode_Cut"
+
+
+class Setting:
+    '''Stand-in for a tkinter Variable, enough for Params and the stages'''
+    def __init__(self, objtype=None):
+        self.objtype = objtype
+        self.v = ''
+
+    def get(self):
+        if self.objtype == BooleanVar:
+            if isinstance(self.v, str):
+                return self.v.strip().lower() in ('1', 'true', 'yes', 'on')
+            return bool(self.v)
+        return str(self.v)
+
+    def set(self, value):
+        self.v = value
+
+    def trace_variable(self, *args):
+        pass
+
+
+class NoGui:
+    '''Absorbs the statusbar/master calls the stages make'''
+    def __getattr__(self, name):
+        return self.__noop
+
+    def __noop(self, *args, **kwargs):
+        return None
+
+
+class HeadlessJob:
+    def __init__(self, settings_file=None, units=None, machine=None):
+        self.p = params.Params()
+        self.p.instantiate_params(self, factory=Setting)
+        self.funits = Setting()
+
+        self.statusMessage = Setting()
+        self.statusbar = NoGui()
+        self.master = NoGui()
+        self.stop = [False]
+        self.k40 = machine
+        self.GUI_Disabled = True
+
+        self.HOME_DIR = os.path.expanduser("~")
+        self.DESIGN_FILE = None
+        self.trace_coords = []
+        self.job_cache = JobCache(os.path.join(self.HOME_DIR, ".k40xw_cache"))
+
+        if settings_file != None:
+            # values are saved in the file's units, so switch to those
+            # units first and then read for real
+            self.p.read(settings_file, self)
+            file_units = self.units.get()
+            self.p.instantiate_params(self, factory=Setting)
+            if file_units == 'in':
+                self.units.set('in')
+            self.p.sync_units(self)
+            self.p.read(settings_file, self)
+        self.p.sync_units(self)
+
+        # no dialog to ask with, unitless DXF files use the settings units
+        if units == None:
+            units = self.units.get()
+        self.dxf_units = units
+
+        self.resetPath()
+
+    ##########################################################################
+    # GUI hooks the borrowed stages call
+    ##########################################################################
+    def update_gui(self, message=None, bgcolor='white'):
+        if message != None:
+            self.statusMessage.set(message)
+        return True
+
+    def move_head_window_temporary(self, new_pos_offset):
+        self.pos_offset = [0.0, 0.0]
+
+    def menu_View_Refresh(self):
+        pass
+
+    def refreshTime(self):
+        pass
+
+    def gcode_error_message(self, message):
+        for line in message:
+            log.warning('%s', line)
+
+    ##########################################################################
+    # the pipeline
+    ##########################################################################
+    def load(self, filename):
+        self.fileload(filename, units=self.dxf_units)
+        if self.RengData.image == None and self.VengData.ecoords == [] and \
+           self.VcutData.ecoords == [] and self.GcodeData.ecoords == []:
+            raise Exception(f"No laser data loaded from {filename}")
+
+    def prepare(self, operation_type=ALL_OPERATIONS):
+        '''Return EGV ints or G-code lines, matching the machine dialect'''
+        self.stop[0] = False
+        if operation_type.find("Raster_Eng") > -1:
+            self.make_raster_coords()
+
+        if self.k40 == None or self.k40.dialect == 'egv':
+            data = self.prep_egv_data(operation_type)
+            if len(data) < 4:
+                raise Exception("No laser data was generated.")
+            return data
+
+        data = self.prep_ecoord_data(operation_type)
+        if len(data) == 0:
+            raise Exception("No laser data was generated.")
+        gcode, segtime = self.k40.ecoord_to_gcode(data)
+        return gcode
+
+    def write(self, data, fname):
+        if self.k40 == None or self.k40.dialect == 'egv':
+            self.write_egv_to_file(data, fname)
+        else:
+            with open(fname, 'w') as fout:
+                fout.write('\n'.join(data))
+                fout.write('\n')
+
+
+# Stage code lives in the GUI class. These only touch settings, the ECoord
+# containers and the hooks above, so they work unchanged on a HeadlessJob.
+for name in ('value', 'resetPath', 'fileload',
+             'Open_SVG', 'Open_DXF', 'Open_G_Code', 'Open_EGV_Design',
+             'clean_vector_paths', 'stitch_vector_paths',
+             'fit_vector_paths', 'fit_arc_paths', 'fit_report',
+             'make_raster_coords', 'raster_cache_key', 'job_cache_active',
+             'rotate_raster', 'generate_bezier', 'convert_halftoning',
+             'Get_Design_Bounds', 'prep_params',
+             'prep_egv_data', 'prep_ecoord_data',
+             'Sort_Paths', 'optimize_paths', 'point_inside_polygon',
+             'remove_self_references', 'addlist',
+             'mirror_rotate_vector_coords', 'scale_vector_coords',
+             'scale_offset_flipy_vector_coords',
+             'write_egv_to_file'):
+    setattr(HeadlessJob, name, getattr(Application, name))
+
+
+def make_machine(fmt):
+    if fmt == 'egv':
+        return None
+    if fmt == 'gcode':
+        from xtool_lib import xtool_CLASS
+        return xtool_CLASS()
+    raise Exception(f'unknown output format: {fmt}')
+
+
+def output_name(design, outdir, fmt):
+    base = os.path.splitext(os.path.basename(design))[0]
+    ext = '.EGV' if fmt == 'egv' else '.gcode'
+    fname = os.path.join(outdir, base + ext)
+    # an EGV or G-code design written back out to the same name
+    # would overwrite the input
+    if os.path.normcase(os.path.abspath(fname)) == os.path.normcase(os.path.abspath(design)):
+        fname = os.path.join(outdir, base + '_out' + ext)
+    return fname
+
+
+def run_job(design, settings_file=None, outdir='.', fmt='egv',
+            operation_type=ALL_OPERATIONS, units=None):
+    '''Prepare one design and write the result. Safe to run in a worker
+       process, returns a summary dict instead of raising.
+    '''
+    k40_whisperer.HEADLESS = True
+    t0 = time()
+    result = {'design': design, 'output': None, 'error': None}
+    try:
+        job = HeadlessJob(settings_file, units=units, machine=make_machine(fmt))
+        job.load(design)
+        data = job.prepare(operation_type)
+        fname = output_name(design, outdir, fmt)
+        job.write(data, fname)
+        result['output'] = fname
+        result['size'] = len(data)
+    except Exception as e:
+        result['error'] = f'{e}'
+        result['traceback'] = traceback.format_exc()
+    result['seconds'] = time() - t0
+    return result
+
+
+def run_batch(designs, settings_file=None, outdir='.', fmt='egv',
+              operation_type=ALL_OPERATIONS, units=None, jobs=None):
+    '''Run run_job over many designs on a process pool'''
+    if jobs == 1 or len(designs) == 1:
+        return [run_job(d, settings_file, outdir, fmt, operation_type, units) for d in designs]
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(run_job, d, settings_file, outdir, fmt, operation_type, units)
+                   for d in designs]
+        return [f.result() for f in futures]
+
+
+def main(argv):
+    try:
+        opts, args = getopt.getopt(argv, "hs:f:o:j:",
+                                   ["help", "settings=", "format=", "ops=",
+                                    "outdir=", "units=", "jobs="])
+    except getopt.GetoptError as e:
+        print(f'{e}')
+        return 2
+
+    settings_file = None
+    fmt = 'egv'
+    operation_type = ALL_OPERATIONS
+    outdir = '.'
+    units = None
+    jobs = None
+
+    for option, value in opts:
+        if option in ('-h', '--help'):
+            print(__doc__)
+            return 0
+        elif option in ('-s', '--settings'):
+            settings_file = value
+        elif option in ('-f', '--format'):
+            fmt = value.lower()
+        elif option in ('-o', '--ops'):
+            operation_type = value
+        elif option == '--outdir':
+            outdir = value
+        elif option == '--units':
+            units = value
+        elif option in ('-j', '--jobs'):
+            jobs = int(value)
+
+    k40_log.configure()
+
+    designs = args
+    if designs == [] and settings_file != None:
+        k40_whisperer.HEADLESS = True
+        designs = [HeadlessJob(settings_file).designfile.get()]
+    if designs == []:
+        print('No design files given')
+        return 2
+
+    os.makedirs(outdir, exist_ok=True)
+
+    t0 = time()
+    results = run_batch(designs, settings_file, outdir, fmt, operation_type, units, jobs)
+
+    failed = 0
+    for r in results:
+        if r['error'] == None:
+            print(f"{r['design']} -> {r['output']}  {r['seconds']:.2f} s")
+        else:
+            failed = failed + 1
+            print(f"{r['design']} FAILED: {r['error']}")
+    print(f'{len(results)-failed} of {len(results)} jobs ok in {time()-t0:.2f} s')
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+'''
+Logging for K40 Whisperer
+
+Copyright (C) 2024 whodafloater
+
+MIT license
+
+Each subsystem gets its own logger under 'k40', so levels can be set
+per subsystem:
+
+    from k40_log import get_logger, TRACE
+    log = get_logger('xtool')
+
+    log.debug('%5d of %d  %s', i, n, line)    # formatted only if enabled
+    TRACE.add('xtool', line)                  # last N commands, no formatting
+
+Levels come from configure(), usually from the --debug option or the
+K40_LOG environment variable:
+
+    K40_LOG=debug                   everything at debug
+    K40_LOG=info,xtool=debug        default info, xtool at debug
+    K40_LOG=egv=warning             only change egv
+
+Disabled log calls cost one level check. Hot loops that would build
+expensive arguments should test log.isEnabledFor(DEBUG) first.
+
+The command trace is a ring buffer of the last commands sent to the
+machine (G-code lines, URLs, EGV packets). It is always on because
+appending a tuple is cheap, and it is dumped when a send fails.
+'''
+
+import os
+import sys
+import logging
+from logging import DEBUG, INFO, WARNING, ERROR
+from time import time
+from collections import deque
+
+ROOT = 'k40'
+FORMAT = '%(levelname)s %(name)s: %(message)s'
+
+logging.getLogger(ROOT).addHandler(logging.NullHandler())
+
+
+def get_logger(subsystem):
+    return logging.getLogger(f'{ROOT}.{subsystem}')
+
+
+def parse_level(level):
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(level.strip().upper())
+    if not isinstance(value, int):
+        raise Exception(f"Unknown log level: {level}")
+    return value
+
+
+def set_level(subsystem, level):
+    '''Set the level of one subsystem, None or '' is the k40 root'''
+    if subsystem:
+        logger = get_logger(subsystem)
+    else:
+        logger = logging.getLogger(ROOT)
+    logger.setLevel(parse_level(level))
+
+
+def configure(spec=None, debug=False, stream=None):
+    '''Install a console handler and apply a level spec
+
+       spec  'level' and/or 'subsystem=level' items separated by commas,
+             defaults to the K40_LOG environment variable
+    '''
+    root = logging.getLogger(ROOT)
+    if not any(getattr(h, 'k40_console', False) for h in root.handlers):
+        handler = logging.StreamHandler(stream if stream != None else sys.stdout)
+        handler.setFormatter(logging.Formatter(FORMAT))
+        handler.k40_console = True
+        root.addHandler(handler)
+        root.propagate = False
+
+    root.setLevel(DEBUG if debug else WARNING)
+
+    if spec == None:
+        spec = os.environ.get('K40_LOG', '')
+    for item in spec.split(','):
+        item = item.strip()
+        if item == '':
+            continue
+        if '=' in item:
+            subsystem, level = item.split('=', 1)
+            set_level(subsystem.strip(), level)
+        else:
+            set_level(None, item)
+
+
+class CommandTrace:
+    '''Ring buffer of the last commands sent to the machine'''
+    def __init__(self, size=500):
+        self.commands = deque(maxlen=size)
+
+    def add(self, subsystem, command):
+        self.commands.append((time(), subsystem, command))
+
+    def clear(self):
+        self.commands.clear()
+
+    def lines(self, last=None):
+        commands = list(self.commands)
+        if last != None:
+            commands = commands[-last:]
+        if commands == []:
+            return []
+        t0 = commands[0][0]
+        return [f'{t-t0:9.3f} {subsystem:6s} {command}' for t, subsystem, command in commands]
+
+    def dump(self, logger, last=50, level=ERROR):
+        '''Write the last commands to a logger, one record per dump'''
+        lines = self.lines(last)
+        if lines != []:
+            logger.log(level, 'last %d commands:\n%s', len(lines), '\n'.join(lines))
+
+
+TRACE = CommandTrace()
@@ -28,6 +28,8 @@ DEBUG = False
 import sys
 from math import *
 from egv import egv
+from egv_file import read_egv, write_egv
+from egv_decode import EgvDecoder
 
 import params
 from nano_library import K40_CLASS
@@ -41,7 +43,13 @@ from svg_reader import SVG_TEXT_EXCEPTION
 from svg_reader import SVG_PXPI_EXCEPTION
 from g_code_library import G_Code_Rip
 from interpolate import interpolate
-from ecoords import ECoord
+from ecoords import ECoord, path_lengths
+from job_cache import JobCache
+from path_fit import merge_collinear, fit_arcs
+from path_stitch import stitch_loops
+from stage_timer import TIMER, timed
+import k40_log
+from k40_log import get_logger, TRACE
 from convex_hull import hull2D
 from embedded_images import K40_Whisperer_Images
 
@@ -123,7 +131,10 @@ except:
     pass
 
 
+log = get_logger('app')
+
 QUIET = False
+HEADLESS = False    # set by k40_headless.py, message boxes go to stdout
 #   
 ################################################################################
 class Application(Frame):
@@ -217,6 +228,7 @@ class Application(Frame):
         self.VengData  = ECoord()
         self.VcutData  = ECoord()
         self.GcodeData = ECoord()
+        self.design_digest = None
         self.SCALE = 1
         self.Design_bounds = (0,0,0,0)
         self.UI_image = None
@@ -339,6 +351,8 @@ class Application(Frame):
 
         self.DESIGN_FILE = (self.HOME_DIR+"/None")
         self.EGV_FILE    = None
+
+        self.job_cache = JobCache(os.path.join(self.HOME_DIR, ".k40xw_cache"))
         
         self.aspect_ratio =  0
         self.segID   = []
@@ -707,6 +721,9 @@ class Application(Frame):
           
         top_Tools.add("command", label = "Calculate Raster Time", command = self.menu_Calc_Raster_Time)
         top_Tools.add("command", label = "Trace Design Boundary <Ctrl-t>", command = self.TRACE_Settings_Window)
+        top_Tools.add_checkbutton(label = "Use Job Cache", variable=self.use_job_cache)
+        top_Tools.add("command", label = "Clear Job Cache", command = self.menu_Clear_Job_Cache)
+        top_Tools.add("command", label = "Stage Timing Report", command = self.menu_Stage_Timing)
         top_Tools.add_separator()
         top_Tools.add("command", label = "Initialize Laser <Ctrl-i>", command = self.Initialize_Laser)
         top_Tools.add("command", label = "Unfreeze Laser <Ctrl-f>"  , command = self.Unfreeze_Laser)
@@ -1669,9 +1686,10 @@ class Application(Frame):
         elif TYPE=='.SVG':
             self.Open_SVG(filename)
         elif TYPE=='.EGV':
-            self.EGV_Send_Window(filename)
+            self.Open_EGV_Design(filename)
         else:
             self.Open_G_Code(filename)
+        self.clean_vector_paths(TYPE)
         self.menu_View_Refresh()
         
         
@@ -1697,6 +1715,7 @@ class Application(Frame):
                                             ("G-Code Files ", ("*.ngc","*.gcode","*.g","*.tap")),\
                                             ("DXF Files ","*.dxf"),\
                                             ("SVG Files ","*.svg"),\
+                                            ("EGV Files ",("*.egv","*.EGV")),\
                                             ("All Files ","*"),\
                                             ("Design Files ", ("*.svg","*.dxf"))],\
                                             initialdir=init_dir)
@@ -1716,12 +1735,67 @@ class Application(Frame):
             self.Open_DXF(fileselect, units=units)
         elif TYPE=='.SVG':
             self.Open_SVG(fileselect)
+        elif TYPE=='.EGV':
+            self.Open_EGV_Design(fileselect)
         else:
             self.Open_G_Code(fileselect)
+        self.clean_vector_paths(TYPE)
 
         self.DESIGN_FILE = fileselect
         self.menu_View_Refresh()
         
+    def clean_vector_paths(self, TYPE):
+        # Open Design and Reload Design both end here, so a reloaded
+        # design comes back with the same paths as when it was opened
+        if TYPE!='.DXF' and TYPE!='.SVG':
+            return
+        if self.stitch_paths.get():
+            self.stitch_vector_paths()
+        if self.fit_paths.get():
+            self.fit_vector_paths()
+
+    @timed('load.stitch_vector_paths')
+    def stitch_vector_paths(self):
+        # lines that arrive out of order each make a loop of their own,
+        # join the ones that meet within the .001 in make_ecoords uses
+        for name, data in (('Vector Cut', self.VcutData), ('Vector Eng', self.VengData)):
+            if data.ecoords == []:
+                continue
+            ecoords, report = stitch_loops(data.ecoords, .001)
+            # same cut length and bounds as make_ecoords found, only
+            # the jumps between loops change
+            data.ecoords = ecoords
+            data.move = path_lengths(ecoords)[1]
+            TIMER.count('stitch_joined', report['before'] - report['after'])
+            log.info('stitch: %s: %d -> %d loops', name, report['before'], report['after'])
+
+    @timed('load.fit_vector_paths')
+    def fit_vector_paths(self):
+        # flattened curves come in as many short segments, drop the
+        # points that lie on a straight run to within fit_tol
+        tol = self.value('fit_tol', 'in')
+        for name, data in (('Vector Cut', self.VcutData), ('Vector Eng', self.VengData)):
+            if data.ecoords == []:
+                continue
+            ecoords, report = merge_collinear(data.ecoords, tol)
+            data.ecoords = ecoords
+            data.len, data.move = path_lengths(ecoords)
+            self.fit_report(name, report)
+
+    def fit_arc_paths(self, name, ecoords):
+        # Vector paths for machines with native arcs, the runs that
+        # fit a circle to within fit_tol go out as one G2/G3
+        ecoords, report = fit_arcs(ecoords, self.value('fit_tol', 'in'))
+        self.fit_report(name, report)
+        return ecoords
+
+    def fit_report(self, name, report):
+        TIMER.count('fit_removed', report['before'] - report['after'])
+        msg = "%s: %d -> %d points, max deviation %.4f in" %(
+              name, report['before'], report['after'], report['max_dev'])
+        log.info('fit: %s', msg)
+        self.statusMessage.set(msg)
+
     def menu_File_Raster_Engrave(self):
         self.menu_File_save_EGV(operation_type="Raster_Eng")
         
@@ -1796,59 +1870,15 @@ class Application(Frame):
             self.DESIGN_FILE = fileselect
             self.EGV_Send_Window(fileselect)
         
+    @timed('load.Open_EGV')
     def Open_EGV(self,filemname,n_passes=1):
         self.stop[0]=False
-        EGV_data=[]
-        value1 = ""
-        value2 = ""
-        value3 = ""
-        value4 = ""
-        data=""
         #value1 and value2 are the absolute y and x starting positions
         #value3 and value4 are the absolute y and x end positions
-        with open(filemname) as f:
-            while True:
-                ## Skip header
-                c = f.read(1)
-                while c!="%" and c:
-                    c = f.read(1)
-                ## Read 1st Value
-                c = f.read(1)
-                while c!="%" and c:
-                    value1 = value1 + c
-                    c = f.read(1)
-                y_start_mils = int(value1) 
-                ## Read 2nd Value
-                c = f.read(1)
-                while c!="%" and c:
-                    value2 = value2 + c
-                    c = f.read(1)
-                x_start_mils = int(value2)   
-                ## Read 3rd Value
-                c = f.read(1)
-                while c!="%" and c:
-                    value3 = value3 + c
-                    c = f.read(1)
-                y_end_mils = int(value3)
-                ## Read 4th Value
-                c = f.read(1)
-                while c!="%" and c:
-                    value4 = value4 + c
-                    c = f.read(1)
-                x_end_mils = int(value4)
-                break
-
-            ## Read Data
-            while True:
-                c = f.read(1)
-                if not c:
-                    break
-                if c=='\n' or c==' ' or c=='\r':
-                    pass
-                else:
-                    data=data+"%c" %c
-                    EGV_data.append(ord(c))
-                    
+        header, EGV_data = read_egv(filemname)
+        y_start_mils, x_start_mils, y_end_mils, x_end_mils = header.values()
+        TIMER.count('bytes', len(EGV_data))
+
         if ( (x_end_mils != 0) or (y_end_mils != 0) ):
             n_passes=1
         else:
@@ -1881,9 +1911,17 @@ class Application(Frame):
         self.Send_Rapid_Move(dxmils,dxmils)
         self.stop[0]=True
         
+    @timed('load.Open_SVG')
     def Open_SVG(self,filemname):
         self.resetPath()
         self.SVG_FILE = filemname
+        if self.job_cache_active():
+            # hash the bytes the raster is made from, the file may be
+            # saved again before the raster is rebuilt
+            try:
+                self.design_digest = self.job_cache.file_digest(self.SVG_FILE)
+            except OSError:
+                self.design_digest = None
         if self.reduced_mem.get():
             self.input_dpi = 500.0
         else:
@@ -1982,11 +2020,24 @@ class Application(Frame):
 
 
     #####################################################################
+    @timed('raster.make_raster_coords')
     def make_raster_coords(self):
         if self.RengData.rpaths:
             return
         try:
             hcoords=[]
+            cache_key = self.raster_cache_key()
+            if cache_key != None and self.RengData.ecoords==[]:
+                cached = self.job_cache.get_ecoords(cache_key)
+                if cached != None:
+                    ecoords, meta = cached
+                    self.RengData.set_ecoords(ecoords,data_sorted=True)
+                    self.RengData.len = meta['len']
+                    self.RengData.n_scanlines = meta['n_scanlines']
+                    self.RengData.hull_coords = meta['hull_coords']
+                    self.RengData.rpaths = True
+                    return
+
             if (self.RengData.image != None and self.RengData.ecoords==[]):
                 ecoords=[]
                 cutoff=128
@@ -2120,6 +2171,11 @@ class Application(Frame):
                 self.RengData.set_ecoords(ecoords,data_sorted=True)
                 self.RengData.len=LENGTH
                 self.RengData.n_scanlines = n_scanlines
+                if cache_key != None:
+                    self.job_cache.put_ecoords(cache_key, ecoords,
+                                               {'len': LENGTH,
+                                                'n_scanlines': n_scanlines,
+                                                'hull_coords': hcoords})
             #Set Flag indicating raster paths have been calculated    
             self.RengData.rpaths = True
             self.RengData.hull_coords = hcoords
@@ -2141,6 +2197,118 @@ class Application(Frame):
             debug_message(traceback.format_exc())
     #######################################################################
 
+    def raster_cache_key(self):
+        '''Job cache key for the raster scan lines of the current design.
+           Everything make_raster_coords reads has to be in here.
+           Returns None when the cache is off or there is no raster.
+        '''
+        if not self.job_cache_active() or self.RengData.image == None:
+            return None
+        if self.design_digest == None:
+            return None
+        p = dict(
+            input_dpi = self.input_dpi,
+            rast_step_mil = int(self.value('rast_step_mil', 'mil')),
+            negate = bool(self.negate.get()),
+            mirror = bool(self.mirror.get()),
+            rotate = bool(self.rotate.get()),
+            halftone = bool(self.halftone.get()),
+            LaserXscale = float(self.LaserXscale.get()),
+            LaserYscale = float(self.LaserYscale.get()),
+            image_size = self.RengData.image.size,
+        )
+        if self.rotary.get():
+            p['LaserRscale'] = float(self.LaserRscale.get())
+        if self.halftone.get():
+            p['ht_size'] = float(self.ht_size.get())
+            p['bezier_M1'] = float(self.bezier_M1.get())
+            p['bezier_M2'] = float(self.bezier_M2.get())
+            p['bezier_weight'] = float(self.bezier_weight.get())
+        return self.job_cache.key('raster', digest=self.design_digest, **p)
+
+    def job_cache_active(self):
+        self.job_cache.enabled = bool(self.use_job_cache.get())
+        try:
+            self.job_cache.max_bytes = int(float(self.job_cache_mb.get())*1024*1024)
+        except ValueError:
+            pass
+        return self.job_cache.enabled
+
+    def menu_Clear_Job_Cache(self):
+        self.job_cache.clear()
+        self.statusMessage.set("Job cache cleared: %s" %(self.job_cache.cache_dir))
+
+
+    def menu_Stage_Timing(self):
+        w = Toplevel(width=400, height=400)
+        w.title('Stage Timing')
+        memory  = BooleanVar()
+        profile = BooleanVar()
+        memory.set(TIMER.memory)
+        profile.set(TIMER.profile)
+
+        def Fill_Text():
+            text.delete("1.0", END)
+            for line in TIMER.report():
+                text.insert(END, line+"\n")
+            profiles = TIMER.profiles()
+            if profiles != []:
+                text.insert(END, "\n")
+                for line in profiles:
+                    text.insert(END, line+"\n")
+
+        def Options_Click():
+            TIMER.set_memory(memory.get())
+            TIMER.profile = profile.get()
+
+        def Clear_Click():
+            TIMER.clear()
+            Fill_Text()
+
+        def Save_Click(chrome_trace):
+            init_dir = os.path.dirname(self.DESIGN_FILE) if self.DESIGN_FILE else self.HOME_DIR
+            filename = asksaveasfilename(defaultextension='.json',
+                                         filetypes=[("JSON File","*.json"),("All Files","*")],
+                                         initialdir=init_dir,
+                                         initialfile="k40_timing.json")
+            if filename == '' or filename == ():
+                return
+            try:
+                if chrome_trace:
+                    TIMER.save_chrome_trace(filename)
+                else:
+                    TIMER.save_json(filename)
+                self.statusMessage.set("File Saved: %s" %(filename))
+                self.statusbar.configure( bg = 'white' )
+            except Exception as e:
+                self.statusMessage.set("Unable to save timing data: %s" %(e))
+                self.statusbar.configure( bg = 'red' )
+
+        #Text Box
+        tf = Frame(w)
+        sb = Scrollbar(tf, orient=VERTICAL)
+        text = Text(tf, width="100", height="25", yscrollcommand = sb.set, bg='white')
+        sb.config(command = text.yview)
+        sb.pack(side =RIGHT, fill = Y)
+        text.pack(side=LEFT,fill=BOTH,expand=1)
+        #End Text Box
+
+        of = Frame(w)
+        Checkbutton(of, text="Track peak memory", variable=memory, command=Options_Click).pack(side=LEFT)
+        Checkbutton(of, text="Profile stages", variable=profile, command=Options_Click).pack(side=LEFT)
+
+        bf = Frame(w)
+        Button(bf, text=" Close ", command = w.destroy).pack(side = RIGHT)
+        Button(bf, text=" Save Chrome Trace ", command = lambda: Save_Click(True)).pack(side = RIGHT)
+        Button(bf, text=" Save JSON ", command = lambda: Save_Click(False)).pack(side = RIGHT)
+        Button(bf, text=" Clear ", command = Clear_Click).pack(side = RIGHT)
+        Button(bf, text=" Refresh ", command = Fill_Text).pack(side = RIGHT)
+
+        bf.pack(side=BOTTOM)
+        of.pack(side=BOTTOM)
+        tf.pack(side=LEFT,fill=BOTH,expand=1)
+        Fill_Text()
+
 
     def rotate_raster(self,image_in):
         wim,him = image_in.size
@@ -2245,12 +2413,13 @@ class Application(Frame):
         root.wait_window(error_report)
         return return_value.get()
 
+    @timed('load.Open_G_Code')
     def Open_G_Code(self,filename):
         self.resetPath()
         
         g_rip = G_Code_Rip()
         try:
-            MSG = g_rip.Read_G_Code(filename, XYarc2line = True, arc_angle=2, units="in", Accuracy="")
+            MSG = g_rip.Read_G_Code(filename, XYarc2line = False, arc_angle=2, units="in", Accuracy="")
             Error_Text = ""
             if MSG!=[]:
                 self.gcode_error_message(MSG)
@@ -2274,9 +2443,45 @@ class Application(Frame):
              )
 
         self.GcodeData.set_ecoords(ecoords,data_sorted=True)
+        # the same paths with the XY arcs left whole, for machines
+        # that cut G2/G3 themselves
+        self.GcodeData.arc_ecoords = g_rip.generate_laser_paths(
+              g_rip.g_code_data,
+              spindle_power_scale=float(self.gcode_import_spindle_power_scale.get()),
+              keep_arcs=True
+             )
         self.Design_bounds = self.GcodeData.bounds
 
         
+    @timed('load.Open_EGV_Design')
+    def Open_EGV_Design(self,filename):
+        # Decode an EGV file into G-Code style paths so it can be previewed,
+        # timed and sent to any machine with the G-Code operations
+        self.resetPath()
+        try:
+            header, EGV_data = read_egv(filename)
+            decoder = EgvDecoder(board_name=self.board_name.get(),
+                                 power=float(self.Vcut_pow.get()))
+            ecoords = decoder.decode(EGV_data)
+        except Exception as e:
+            msg1 = "EGV Load Failed:  "
+            msg2 = "Filename: %s" %(filename)
+            msg3 = "%s" %(e)
+            self.statusMessage.set((msg1+msg3).split("\n")[0] )
+            self.statusbar.configure( bg = 'red' )
+            message_box(msg1, "%s\n%s" %(msg2,msg3))
+            debug_message(traceback.format_exc())
+            return
+
+        TIMER.count('ecoords', len(ecoords))
+        self.GcodeData.set_ecoords(ecoords,data_sorted=True)
+        # the points are collapsed staircases, the decoder counted every move
+        self.GcodeData.len = decoder.cut_length
+        self.GcodeData.move = decoder.move_length
+        self.GcodeData.gcode_time = decoder.time
+        self.Design_bounds = self.GcodeData.bounds
+
+    @timed('load.Open_DXF')
     def Open_DXF(self,filemname, units=None):
         self.resetPath()
         
@@ -2284,10 +2489,9 @@ class Application(Frame):
         dxf_import=DXF_CLASS()
         tolerance = .0005
         try:
-            fd = open(self.DXF_FILE)
-            dxf_import.GET_DXF_DATA(fd,lin_tol = tolerance,get_units=True,units=None)
-            fd.seek(0)
-            
+            with open(self.DXF_FILE) as fd:
+                dxf_import.PARSE_DXF_DATA(fd)
+
             dxf_units = dxf_import.units
 
             print(f'      dxf units from file: {dxf_units}')
@@ -2328,8 +2532,7 @@ class Application(Frame):
                    return    
 
             lin_tol = tolerance / dxf_scale
-            dxf_import.GET_DXF_DATA(fd,lin_tol=lin_tol,get_units=False,units=None)
-            fd.close()
+            dxf_import.MAKE_DXF_COORDS(lin_tol=lin_tol)
         #except StandardError as e:
         except Exception as e:
             msg1 = "DXF Load Failed:"
@@ -2347,11 +2550,8 @@ class Application(Frame):
         dxf_engrave_coords = dxf_import.DXF_COORDS_GET_TYPE(engrave=True, new_origin=False)
         dxf_cut_coords     = dxf_import.DXF_COORDS_GET_TYPE(engrave=False,new_origin=False)
 
-        if DEBUG:
-           print("dxf engraves")
-           print(dxf_engrave_coords)
-           print("dxf cuts")
-           print(dxf_cut_coords)
+        log.debug("dxf engraves %s", dxf_engrave_coords)
+        log.debug("dxf cuts %s", dxf_cut_coords)
 
 ##        if DEBUG:
 ##            dxf_code = dxf_import.WriteDXF(close_loops=False)
@@ -2720,7 +2920,7 @@ class Application(Frame):
 
     def Vector_Cut(self):
         self.Prepare_for_laser_run("Vector Cut: Processing Vector Data.")
-        print(f'Vector_Cut: {self.VcutData.ecoords}')
+        log.debug('Vector_Cut: %d ecoords', len(self.VcutData.ecoords))
         if self.VcutData.ecoords!=[]:
             self.upload_filetype.set('cut')
             self.send_data("Vector_Cut")
@@ -3037,7 +3237,9 @@ class Application(Frame):
 
         return inside
 
+    @timed('sort.optimize_paths')
     def optimize_paths(self,ecoords,inside_check=True):
+        TIMER.count('ecoords', len(ecoords))
         order_out = self.Sort_Paths(ecoords)    
         lastx=-999
         lasty=-999
@@ -3159,18 +3361,23 @@ class Application(Frame):
         
         for i in range(len(coords)):
             coords_rotate_mirror.append(coords[i][:])
+            # arc points carry a centre at [5],[6] that moves with them
+            xy = (0,1,5,6) if len(coords[i]) > 7 else (0,1)
             if self.mirror.get():
-                if self.inputCSYS.get() and self.RengData.image == None:
-                    coords_rotate_mirror[i][0]=-coords_rotate_mirror[i][0]
-                else:
-                    coords_rotate_mirror[i][0]=xmin+xmax-coords_rotate_mirror[i][0]
-                
+                for j in xy[0::2]:
+                    if self.inputCSYS.get() and self.RengData.image == None:
+                        coords_rotate_mirror[i][j]=-coords_rotate_mirror[i][j]
+                    else:
+                        coords_rotate_mirror[i][j]=xmin+xmax-coords_rotate_mirror[i][j]
+                if len(xy) > 2:
+                    coords_rotate_mirror[i][7] = 5 - coords_rotate_mirror[i][7]
                 
             if self.rotate.get():
-                x = coords_rotate_mirror[i][0]
-                y = coords_rotate_mirror[i][1]
-                coords_rotate_mirror[i][0] = -y
-                coords_rotate_mirror[i][1] =  x
+                for j in xy[0::2]:
+                    x = coords_rotate_mirror[i][j]
+                    y = coords_rotate_mirror[i][j+1]
+                    coords_rotate_mirror[i][j]   = -y
+                    coords_rotate_mirror[i][j+1] =  x
                 
         return coords_rotate_mirror
 
@@ -3227,6 +3434,14 @@ class Application(Frame):
             y = coords_scale[i][1] - starty
             coords_scale[i][0] = x * Xscale
             coords_scale[i][1] = y * Yscale
+            if len(coords_scale[i]) > 7:
+                # arc centre, a flip turns G2 into G3
+                x = coords_scale[i][5] - startx
+                y = coords_scale[i][6] - starty
+                coords_scale[i][5] = x * Xscale
+                coords_scale[i][6] = y * Yscale
+                if Xscale * Yscale < 0:
+                    coords_scale[i][7] = 5 - coords_scale[i][7]
 
         scaled_startx = startx * Xscale
         scaled_starty = starty * Yscale
@@ -3238,6 +3453,7 @@ class Application(Frame):
         raise Exception("feed_factor() is deprectated: use self.value(name, 'mm/sec')")
 
 
+    @timed('send_data')
     def send_data(self, operation_type=None):
 
         if self.k40 == None:
@@ -3245,7 +3461,7 @@ class Application(Frame):
             self.statusbar.configure( bg = 'red' ) 
             return
 
-        print(f'send_data: dialect = {self.k40.dialect}')
+        log.info('send_data: dialect = %s', self.k40.dialect)
 
         if self.k40.dialect == 'egv':
             data = self.prep_egv_data(operation_type)
@@ -3253,8 +3469,21 @@ class Application(Frame):
 
         elif self.k40.dialect == 'ecoord':
             data = self.prep_ecoord_data(operation_type)
- 
-            gc, segtime = self.k40.ecoord_to_gcode(data)
+
+            gc = None
+            if self.job_cache_active():
+                gcode_key = self.job_cache.data_key('gcode', data,
+                                                    machine=type(self.k40).__name__,
+                                                    linear_rapid=self.k40.linear_rapid,
+                                                    spindle_power_scale=self.k40.spindle_power_scale,
+                                                    safety_power_scale=self.k40.safety_power_scale)
+                cached = self.job_cache.get_gcode(gcode_key)
+                if cached != None:
+                    gc, segtime = cached[0], cached[1]['segtime']
+            if gc == None:
+                gc, segtime = self.k40.ecoord_to_gcode(data)
+                if self.job_cache_active():
+                    self.job_cache.put_gcode(gcode_key, gc, {'segtime': segtime})
             #print(gc)
             if self.preview(gc) == "send":
                self.send_machine_data(data, 1)
@@ -3337,8 +3566,9 @@ class Application(Frame):
         
         return startx, starty, FlipXoffset, Rapid_Feed
 
+    @timed('encode.prep_ecoord_data')
     def prep_ecoord_data(self, operation_type=None):
-        print('prep_ecoord_data:' + operation_type)
+        log.info('prep_ecoord_data: %s', operation_type)
 
         cutcoords = [None] * 6
         passes = [None] * 6
@@ -3350,6 +3580,14 @@ class Application(Frame):
 
         startx, starty, FlipXoffset, Rapid_Feed = self.prep_params()
 
+        # machines that cut arcs get them whole, unless unequal x and y
+        # scales would stretch them into ellipses
+        Xscale = float(self.LaserXscale.get())
+        Yscale = float(self.LaserYscale.get())
+        if self.rotary.get():
+            Yscale = Yscale*float(self.LaserRscale.get())
+        arcs = getattr(self.k40, 'native_arcs', False) and abs(Xscale) == abs(Yscale)
+
         if (operation_type.find("Vector_Cut") > -1) and  (self.VcutData.ecoords!=[]):
             feed = self.value('Vcut_feed', 'mm/sec')
             power = float(self.Vcut_pow.get())
@@ -3357,15 +3595,15 @@ class Application(Frame):
             self.statusMessage.set("Vector Cut: Determining Cut Order....")
             self.master.update()
 
-            print(f'prep_ecooord_data: {self.VcutData.ecoords}')
+            log.debug('prep_ecoord_data: %d Vcut ecoords', len(self.VcutData.ecoords))
 
             if not self.VcutData.sorted and self.inside_first.get():
                 self.VcutData.set_ecoords(self.optimize_paths(self.VcutData.ecoords),data_sorted=True)
             self.VcutData.add_feed(rapid, feed, power)
 
-            print(self.VcutData.ecoords)
-
             cutcoords[0] = self.VcutData.ecoords
+            if arcs and self.fit_paths.get():
+                cutcoords[0] = self.fit_arc_paths("Vector Cut", cutcoords[0])
             passes[0] = int(float(self.Vcut_passes.get()))
 
 
@@ -3381,6 +3619,8 @@ class Application(Frame):
             self.VengData.add_feed(rapid, feed, power)
 
             cutcoords[1] = self.VengData.ecoords
+            if arcs and self.fit_paths.get():
+                cutcoords[1] = self.fit_arc_paths("Vector Eng", cutcoords[1])
             passes[1] = int(float(self.Veng_passes.get()))
 
 
@@ -3417,6 +3657,8 @@ class Application(Frame):
 
         if (operation_type.find("Gcode_Cut") > -1) and  (self.GcodeData.ecoords!=[]):
             cutcoords[3] = self.GcodeData.ecoords
+            if arcs and self.GcodeData.arc_ecoords!=[]:
+                cutcoords[3] = self.GcodeData.arc_ecoords
             passes[3] = 1
 
 
@@ -3435,6 +3677,7 @@ class Application(Frame):
 
         return data
 
+    @timed('encode.prep_egv_data')
     def prep_egv_data(self, operation_type=None):
         num_passes=0
         try:
@@ -3565,9 +3808,23 @@ class Application(Frame):
                     Yscale = Yscale*Rscale
                 raster_starty = Yscale*starty
 
+                raster_key = self.raster_cache_key()
+                if raster_key != None:
+                    raster_key = self.job_cache.key('raster_egv', parent=raster_key,
+                                                    Feed=Feed_Rate,
+                                                    board_name=self.board_name.get(),
+                                                    Raster_step=Raster_step,
+                                                    startY=raster_starty,
+                                                    FlipXoffset=FlipXoffset,
+                                                    Rapid_Feed=Rapid_Feed)
+                    cached = self.job_cache.get_egv(raster_key)
+                    if cached != None:
+                        Raster_Eng_data = cached[0]
+
+            if (operation_type.find("Raster_Eng") > -1) and  (self.RengData.ecoords!=[]) and Raster_Eng_data==[]:
                 self.statusMessage.set("Generating EGV data...")
                 self.master.update()
-                Raster_Eng_egv_inst = egv(target=lambda s:Raster_Eng_data.append(s))
+                Raster_Eng_egv_inst = egv(target=Raster_Eng_data.append, strip_redundant=True)
                 Raster_Eng_egv_inst.make_egv_data(
                                                 self.RengData.ecoords,            \
                                                 startX=raster_startx,             \
@@ -3581,9 +3838,8 @@ class Application(Frame):
                                                 Rapid_Feed_Rate = Rapid_Feed,     \
                                                 use_laser=True
                                                 )
-                #print(len(Raster_Eng_data))
-                Raster_Eng_data=Raster_Eng_egv_inst.strip_redundant_codes(Raster_Eng_data)
-                #print(len(Raster_Eng_data))
+                if raster_key != None:
+                    self.job_cache.put_blob(raster_key, Raster_Eng_data)
 
             if (operation_type.find("Gcode_Cut") > -1) and (self.GcodeData.ecoords!=[]):
                 self.statusMessage.set("Generating EGV data...")
@@ -3607,7 +3863,7 @@ class Application(Frame):
                                                 Rapid_Feed_Rate = Rapid_Feed,     \
                                                 use_laser=True
                                                 )
-                print(Gcode_coords)
+                log.debug('Gcode_coords: %d egv codes', len(Gcode_coords))
               
             ### Join Resulting Data together ###
             data=[]
@@ -3672,41 +3928,45 @@ class Application(Frame):
     def send_machine_data(self,data,num_passes=1):        
         return self.send_egv_data(data,num_passes=1)
         
+    @timed('send.send_egv_data')
     def send_egv_data(self,data,num_passes=1):        
         pre_process_CRC        = self.pre_pr_crc.get()
         if self.k40 != None:
-            print(f'send_egv_data: dialect = {self.k40.dialect}')
+            log.info('send_egv_data: dialect = %s', self.k40.dialect)
             self.k40.timeout       = int(float( self.t_timeout.get()  )) 
             self.k40.n_timeouts    = int(float( self.n_timeouts.get() ))
             time_start = time()
 
-            if self.upload_style.get() == 'linebyline':
-                self.k40.send_data(
-                    data,
-                    self.update_gui,
-                    self.stop,
-                    num_passes,
-                    pre_process_CRC,
-                    wait_for_laser=self.wait.get()
-                   )
-
-            elif self.upload_style.get() == 'uploadfile':
-                self.k40.upload_file(
-                    data,
-                    self.update_gui,
-                    self.stop,
-                    num_passes,
-                    pre_process_CRC,
-                    wait_for_laser=self.wait.get(),
-                    filetype = self.upload_filetype.get()
-                   )
+            try:
+                if self.upload_style.get() == 'linebyline':
+                    self.k40.send_data(
+                        data,
+                        self.update_gui,
+                        self.stop,
+                        num_passes,
+                        pre_process_CRC,
+                        wait_for_laser=self.wait.get()
+                       )
+
+                elif self.upload_style.get() == 'uploadfile':
+                    self.k40.upload_file(
+                        data,
+                        self.update_gui,
+                        self.stop,
+                        num_passes,
+                        pre_process_CRC,
+                        wait_for_laser=self.wait.get(),
+                        filetype = self.upload_filetype.get()
+                       )
 
-            else:
-               raise Exception(f'Upload style unknown: {self.upload_style.get()}')
+                else:
+                   raise Exception(f'Upload style unknown: {self.upload_style.get()}')
+            except:
+                TRACE.dump(log)
+                raise
 
             self.run_time = time()-time_start
-            if DEBUG:
-                print(("Elapsed Time: %.6f" %(time()-time_start)))
+            log.debug("Elapsed Time: %.6f", time()-time_start)
             
         else:
             self.statusMessage.set("Laser is not initialized.")
@@ -3715,35 +3975,19 @@ class Application(Frame):
 
         self.upload_filetype.set('safe')
         self.menu_View_Refresh()
-        
+
     ##########################################################################
     ##########################################################################
-    def write_egv_to_file(self, data, fname):
-        print(f'write_egv_to_file   fname={fname}')
-        #fname = "tmp.egv"
+    @timed('save.write_egv_to_file')
+    def write_egv_to_file(self, data, fname, wrap=0, fsync=False):
+        log.info('write_egv_to_file: %s  %d codes', fname, len(data))
         if len(data) == 0:
             raise Exception("No data available to write to file.")
-        #try:
-        #    #fout = open(fname,'w')
-        #    fout = open(fname,'w', buffering=1)
-        #except:
-        #    raise Exception("Unable to open file ( %s ) for writing." %(fname))
-
-        fout = open(fname,'w', buffering=1)
-        #fout = open(fname,'w')
-        print(fout)
-        fout.write("Document type : LHYMICRO-GL file\n")
-        fout.write("Creator-Software: K40 Whisperer\n")
-
-        fout.write("\n")
-        fout.write("%0%0%0%0%")
-        for char_val in data:
-            char = chr(char_val)
-            fout.write("%s" %(char))
-            print(f'   egv: {char}');
-
-        fout.write("\n")
-        fout.close
+        try:
+            nbytes = write_egv(fname, data, wrap=wrap, fsync=fsync)
+        except OSError as e:
+            raise Exception("Unable to write file ( %s ): %s" %(fname, e))
+        TIMER.count('bytes', nbytes)
 
         self.menu_View_Refresh()
         self.statusMessage.set("Data saved to: %s" %(fname))
@@ -5817,6 +6061,9 @@ def fmessage(text,newline=True):
 #                               Message Box                                    #
 ################################################################################
 def message_box(title,message):
+    if HEADLESS:
+        fmessage("%s %s" %(title,message))
+        return
     title = "%s (K40 Whisperer V%s)" %(title,version)
     if VERSION == 3:
         tkinter.messagebox.showinfo(title,message)
@@ -5840,7 +6087,9 @@ def message_ask_ok_cancel(title, mess):
 def debug_message(message):
     global DEBUG
     title = "Debug Message"
-    if DEBUG:
+    if DEBUG and HEADLESS:
+        sys.stdout.write(message)
+    elif DEBUG:
         if VERSION == 3:
             tkinter.messagebox.showinfo(title,message)
         else:
@@ -6251,6 +6500,7 @@ if __name__ == "__main__":
             filetoload = value
             #print(f'filetoload = {filetoload}')
 
+    k40_log.configure(debug=DEBUG)
     if DEBUG:
         import inspect
         #debug_message("Debuging is turned on.")
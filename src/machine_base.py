@@ -41,6 +41,9 @@ class MachineBase:
        self.dialect = 'ecoord'
        #self.dialect = 'egv'
 
+       # set when the machine cuts G2/G3 arcs itself
+       self.native_arcs = False
+
 
     def initialize_device(self, Location=None, verbose=False):
         if Location != None:
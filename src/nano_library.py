@@ -32,6 +32,8 @@ from egv import egv
 import traceback
 from windowsinhibitor import WindowsInhibitor
 from time import time
+from stage_timer import TIMER, timed
+from k40_log import TRACE
 
 ##############################################################################
 
@@ -164,6 +166,7 @@ class K40_CLASS:
         #Don't delete this function (used in send_data)
         return False
     
+    @timed('nano.send_data')
     def send_data(self,data,update_gui=None,stop_calc=None,passes=1,preprocess_crc=True, wait_for_laser=False):
         if stop_calc == None:
             stop_calc=[]
@@ -238,6 +241,8 @@ class K40_CLASS:
 
 
     def send_packet_w_error_checking(self,line,update_gui=None,stop_calc=None):
+        TIMER.count('packets')
+        TRACE.add('nano', line)
         timeout_cnt = 1
         crc_cnt     = 1
         while True:
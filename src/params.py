@@ -172,6 +172,13 @@ class Params:
         d['inkscape_path']     = [StringVar,   "", 0,    1, "", "%s", ""]
         d['batch_path']        = [StringVar,   "", 0,    1, "", "%s", ""]
 
+        d['use_job_cache']     = [BooleanVar,   0, 0,    1, "", ":s", ""]
+        d['job_cache_mb']      = [StringVar,   256, 0,  100000, "u", ":s", "d"]
+
+        d['stitch_paths']      = [BooleanVar,   0, 0,    1, "", ":s", ""]
+        d['fit_paths']         = [BooleanVar,   0, 0,    1, "", ":s", ""]
+        d['fit_tol']           = [StringVar,   0.02, 0,  1, "mm", ":s", -2]
+
         d['min_vector_speed']  = [StringVar,   1.1, 1.1,  100, "in/min", "%s", 0]
         d['min_raster_speed']  = [StringVar,   12,  12,   100, "in/min", "%s", 0]
 
@@ -192,7 +199,7 @@ class Params:
         return code
 
 
-    def instantiate_params(self, context):
+    def instantiate_params(self, context, factory=None):
         """Instantiate all the parameters in a context
 
         After calling this function you can access all the values as
@@ -200,6 +207,9 @@ class Params:
 
         value = mySpecialVar.get()
         mySpecialVar.set(value)
+
+        factory(objtype) can supply stand-in objects with get()/set()
+        for contexts that have no Tk root, see k40_headless.py
         """
 
         d = self.d
@@ -213,7 +223,10 @@ class Params:
             maxval =  d[n][3]
 
             #print(f'instantiate_params: {name} {value}')
-            context.__dict__[name] = objtype()
+            if factory == None:
+                context.__dict__[name] = objtype()
+            else:
+                context.__dict__[name] = factory(objtype)
             context.__dict__[name].set(value)
 
 
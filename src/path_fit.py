@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+'''
+Line and arc fitting for dense ecoords paths
+
+Copyright (C) 2025 whodafloater
+
+MIT license
+
+SVG curves and DXF splines arrive as runs of very short segments and
+every one of them becomes its own G-code line or EGV move. Two passes
+thin them out.
+
+merge_collinear() drops the points that sit within a tolerance of a
+straight segment between the points it keeps. It works with any
+machine.
+
+fit_arcs() replaces runs of points that sit on a circle with a single
+arc point, [x, y, loop, feed, power, cx, cy, code], where code 2 is
+clockwise and 3 is counter clockwise, as G2/G3. That format is the one
+Open_G_Code keeps for machines with native_arcs.
+
+Both work loop by loop, they never join points from different loops,
+and both hand back the new list and a report
+
+    {'before': points in, 'after': points out, 'max_dev': worst error}
+
+The deviation is measured against the points that were handed in.
+'''
+
+from math import asin, atan2, hypot, pi
+
+from arc_flatten import arc_sweep
+
+
+def merge_collinear(ecoords, tol):
+    '''Drop points within tol of the straight segment that replaces them'''
+    out = []
+    max_dev = 0.0
+    n = len(ecoords)
+    a = 0
+    while a < n:
+        out.append(ecoords[a])
+        b = run_end(ecoords, a, tol)
+        for i in range(a+1, b):
+            max_dev = max(max_dev, segment_dist(ecoords[i], ecoords[a], ecoords[b]))
+        a = b if b > a else a+1
+    return out, report(ecoords, out, max_dev)
+
+
+def run_end(ecoords, a, tol):
+    # Index of the last point a straight segment from point a can reach.
+    # Each point p at distance d from a leaves the segment end a wedge
+    # of directions asin(tol/d) either side of it. The wedges are kept
+    # as angles from the first direction and narrowed as the run grows.
+    x0, y0, loop = ecoords[a][0], ecoords[a][1], ecoords[a][2]
+    lo = -pi
+    hi = pi
+    ref = None
+    dmax = 0.0
+    end = a
+    for i in range(a+1, len(ecoords)):
+        x, y = ecoords[i][0], ecoords[i][1]
+        if ecoords[i][2] != loop:
+            break
+        d = hypot(x-x0, y-y0)
+        if d <= tol:
+            # still inside the tolerance circle of the start
+            if dmax - d > tol:
+                break
+            end = i
+            continue
+        if ref == None:
+            ref = atan2(y-y0, x-x0)
+        ang = (atan2(y-y0, x-x0) - ref + pi) % (2*pi) - pi
+        if ang < lo or ang > hi or d < dmax - tol:
+            break
+        end = i
+        dmax = max(dmax, d)
+        half = asin(min(tol/d, 1.0))
+        lo = max(lo, ang - half)
+        hi = min(hi, ang + half)
+    return end
+
+
+def segment_dist(p, a, b):
+    # distance from point p to the segment a-b
+    dx = b[0]-a[0]
+    dy = b[1]-a[1]
+    L2 = dx*dx + dy*dy
+    if L2 == 0.0:
+        return hypot(p[0]-a[0], p[1]-a[1])
+    t = ((p[0]-a[0])*dx + (p[1]-a[1])*dy) / L2
+    t = min(max(t, 0.0), 1.0)
+    return hypot(p[0]-a[0]-t*dx, p[1]-a[1]-t*dy)
+
+
+def fit_arcs(ecoords, tol, min_points=3):
+    '''Replace runs of at least min_points segments that fit a circle
+    within tol by one arc point. The ecoords need feed and power.
+    '''
+    out = []
+    max_dev = 0.0
+    n = len(ecoords)
+    a = 0
+    while a < n:
+        if a == 0 or ecoords[a][2] != ecoords[a-1][2]:
+            out.append(ecoords[a])
+        # grow the arc by doubling, then narrow down the first miss
+        good = None
+        step = min_points
+        b = a + step
+        while b < n and ecoords[b][2] == ecoords[a][2]:
+            fit = circle_fit(ecoords, a, b, tol)
+            if fit == None:
+                break
+            good = (b, fit)
+            step = step*2
+            b = a + step
+        if good != None:
+            lo = good[0]
+            hi = min(b, n)
+            while hi - lo > 1:
+                mid = (lo+hi)//2
+                fit = None
+                if ecoords[mid][2] == ecoords[a][2]:
+                    fit = circle_fit(ecoords, a, mid, tol)
+                if fit == None:
+                    hi = mid
+                else:
+                    lo = mid
+                    good = (mid, fit)
+            b, (cx, cy, code, dev) = good
+            e = ecoords[b]
+            out.append([e[0], e[1], e[2], e[3], e[4], cx, cy, code])
+            max_dev = max(max_dev, dev)
+            a = b
+        else:
+            if a+1 < n and ecoords[a+1][2] == ecoords[a][2]:
+                out.append(ecoords[a+1])
+            a = a+1
+    return out, report(ecoords, out, max_dev)
+
+
+def circle_fit(ecoords, a, b, tol):
+    # Circle through the first, middle and last points of a..b, or None
+    # when a point or a segment middle is off it by more than tol, or the
+    # run does not turn one way by less than a full turn
+    x1, y1 = ecoords[a][0], ecoords[a][1]
+    x2, y2 = ecoords[(a+b)//2][0], ecoords[(a+b)//2][1]
+    x3, y3 = ecoords[b][0], ecoords[b][1]
+    d = 2.0*(x1*(y2-y3) + x2*(y3-y1) + x3*(y1-y2))
+    chord = hypot(x3-x1, y3-y1) + hypot(x2-x1, y2-y1)
+    if abs(d) <= 1e-12 or chord == 0.0:
+        return None
+    s1 = x1*x1 + y1*y1
+    s2 = x2*x2 + y2*y2
+    s3 = x3*x3 + y3*y3
+    cx = (s1*(y2-y3) + s2*(y3-y1) + s3*(y1-y2)) / d
+    cy = (s1*(x3-x2) + s2*(x1-x3) + s3*(x2-x1)) / d
+    R = hypot(x1-cx, y1-cy)
+    # nearly straight runs make huge circles, leave those to the lines
+    if R > 1000.0*chord:
+        return None
+    ccw = d > 0
+
+    dev = 0.0
+    turn = 0.0
+    last = atan2(y1-cy, x1-cx)
+    px, py = x1, y1
+    for i in range(a+1, b+1):
+        x, y = ecoords[i][0], ecoords[i][1]
+        dev = max(dev, abs(hypot(x-cx, y-cy) - R),
+                       abs(hypot((x+px)/2-cx, (y+py)/2-cy) - R))
+        if dev > tol:
+            return None
+        ang = atan2(y-cy, x-cx)
+        step = (ang - last) % (2*pi)
+        if not ccw and step > 0.0:
+            step = step - 2*pi
+        if abs(step) > pi:
+            return None
+        turn = turn + step
+        last = ang
+        px, py = x, y
+    if abs(turn) >= 2*pi:
+        return None
+
+    # the arc has to run the same way the points do
+    radius, start, sweep = arc_sweep(x1, y1, x3, y3, cx, cy, ccw)
+    if abs(sweep - turn) > 1e-6:
+        return None
+    return cx, cy, 3 if ccw else 2, dev
+
+
+def report(before, after, max_dev):
+    return {'before': len(before), 'after': len(after), 'max_dev': max_dev}
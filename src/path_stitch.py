@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+'''
+Joining of out of order loops in ecoords paths
+
+Copyright (C) 2025 whodafloater
+
+MIT license
+
+ECoord.make_ecoords only joins a segment to the one before it. CAD
+exports often list the lines of one outline in no particular order,
+and then every line becomes a loop of its own. That costs a rapid move
+per line, and Sort_Paths is slow with thousands of loops to order.
+
+stitch_loops() puts the ends of the open loops in a grid of cells the
+size of the tolerance. Each loop is then grown at both ends with the
+loops whose ends meet it, reversing them when they run the other way,
+until it closes or no more loops meet it. Loops that already close are
+left as they are. The loops keep the order of the first loop in each
+chain, and loops that only follow on from the one before them stay in
+the same order and direction.
+
+Joined ends are merged into one point, and the last point of a chain
+that closes is set to the first. The new list comes back with a report
+
+    {'before': loops in, 'after': loops out}
+'''
+
+from itertools import groupby
+from math import hypot
+from operator import itemgetter
+
+
+def stitch_loops(ecoords, tol):
+    '''Join open loops whose ends are within tol into longer loops'''
+    paths = [list(pts) for loop, pts in groupby(ecoords, key=itemgetter(2))]
+    n = len(paths)
+    rings = bytearray(n)
+    grid = EndGrid(tol)
+    for k, pts in enumerate(paths):
+        if closed(pts, tol):
+            rings[k] = 1
+        else:
+            grid.add(pts[0], k, 0)
+            grid.add(pts[-1], k, 1)
+
+    used = bytearray(len(paths))
+    out = []
+    loop = 0
+    for k, pts in enumerate(paths):
+        if used[k]:
+            continue
+        used[k] = 1
+        loop = loop+1
+        if rings[k]:
+            add_path(out, [pts], loop, False)
+            continue
+
+        # grow forward from the end, then backward from the start
+        tail = [pts]
+        head = []
+        last = k
+        is_closed = False
+        while True:
+            end = tail[-1][-1]
+            if (len(tail) > 1 or len(pts) > 2) and near(end, first_point(head, tail), tol):
+                is_closed = True
+                break
+            # the next loop in the list is tried first
+            j = last+1
+            if j < n and not used[j] and not rings[j] and near(end, paths[j][0], tol):
+                found = (j, 0)
+            else:
+                found = grid.find(end, used)
+            if found == None:
+                break
+            j, side = found
+            used[j] = 1
+            last = j
+            tail.append(paths[j] if side == 0 else paths[j][::-1])
+        while not is_closed:
+            found = grid.find(first_point(head, tail), used)
+            if found == None:
+                break
+            j, side = found
+            used[j] = 1
+            head.append(paths[j] if side == 1 else paths[j][::-1])
+        add_path(out, head[::-1] + tail, loop, is_closed)
+    return out, {'before': len(paths), 'after': loop}
+
+
+def first_point(head, tail):
+    if head:
+        return head[-1][0]
+    return tail[0][0]
+
+
+def closed(pts, tol):
+    return len(pts) > 2 and near(pts[0], pts[-1], tol)
+
+
+def near(p, q, tol):
+    return hypot(p[0]-q[0], p[1]-q[1]) <= tol
+
+
+def add_path(out, pieces, loop, is_closed):
+    # the first point of each piece after the first is a joined end
+    start = len(out)
+    for n, pts in enumerate(pieces):
+        for p in pts[1:] if n else pts:
+            out.append([p[0], p[1], loop])
+    if is_closed:
+        out[-1][0] = out[start][0]
+        out[-1][1] = out[start][1]
+
+
+class EndGrid:
+    '''Loop ends in cells the size of the tolerance'''
+    def __init__(self, tol):
+        self.tol = tol
+        self.cells = dict()
+
+    def cell(self, p):
+        return (int(p[0]//self.tol), int(p[1]//self.tol))
+
+    def add(self, p, k, side):
+        self.cells.setdefault(self.cell(p), []).append((p, k, side))
+
+    def find(self, p, used):
+        '''The unused loop end within tol of p with the lowest loop
+        number, as (loop, side) where side 0 is the start, or None.
+        The cell of p is searched before the ones around it.
+        '''
+        cx, cy = self.cell(p)
+        best = None
+        for dx, dy in ((0,0), (-1,0), (1,0), (0,-1), (0,1), (-1,-1), (1,-1), (-1,1), (1,1)):
+            for q, k, side in self.cells.get((cx+dx, cy+dy), ()):
+                if not used[k] and near(p, q, self.tol):
+                    if best == None or k < best[0]:
+                        best = (k, side)
+            if best != None:
+                return best
+        return None
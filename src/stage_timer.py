@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+'''
+Stage timing and profiling for K40 Whisperer
+
+Copyright (C) 2024 whodafloater
+
+MIT license
+
+A span is one run of a pipeline stage. It records wall time, item
+counts (segments, packets, HTTP requests ...), optionally the peak
+traced memory and a cProfile summary.
+
+    from stage_timer import TIMER, timed
+
+    @timed('egv.make_egv_data')
+    def make_egv_data(...):
+        ...
+        TIMER.count('segments', n)
+
+    with TIMER.span('load'):
+        ...
+
+Spans nest per thread. Finished spans are kept in a bounded list and
+can be shown as a text report, saved as JSON or saved in Chrome trace
+format (load it in chrome://tracing or https://ui.perfetto.dev).
+
+Timing is always on, it costs a few microseconds per stage.
+Memory tracking (tracemalloc) and profiling slow everything down and
+are off until switched on.
+'''
+
+import os
+import io
+import json
+import threading
+import functools
+import tracemalloc
+import cProfile
+import pstats
+from time import perf_counter
+from collections import deque
+
+
+class Span:
+    def __init__(self, name, depth):
+        self.name = name
+        self.depth = depth
+        self.thread = threading.get_ident()
+        self.start = 0.0
+        self.end = 0.0
+        self.items = {}
+        self.peak_mem = None
+        self.profile = None
+
+        # bookkeeping for memory tracking
+        self.mem_start = 0
+        self.mem_peak_abs = 0
+
+    @property
+    def elapsed(self):
+        return self.end - self.start
+
+    def count(self, what, n=1):
+        self.items[what] = self.items.get(what, 0) + n
+
+    def as_dict(self, t0=0.0):
+        d = {'name': self.name,
+             'depth': self.depth,
+             'start': self.start - t0,
+             'elapsed': self.elapsed,
+             'items': dict(self.items)}
+        if self.peak_mem != None:
+            d['peak_mem'] = self.peak_mem
+        if self.profile != None:
+            d['profile'] = self.profile
+        return d
+
+
+class StageTimer:
+    def __init__(self, max_spans=2000):
+        self.enabled = True
+        self.memory = False
+        self.profile = False
+        self.profile_lines = 25
+
+        self.spans = deque(maxlen=max_spans)
+        self.t0 = perf_counter()
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+        self.__profiling = False
+
+    def __stack(self):
+        stack = getattr(self.__local, 'stack', None)
+        if stack == None:
+            stack = []
+            self.__local.stack = stack
+        return stack
+
+    ##########################################################################
+    # recording
+    ##########################################################################
+    def begin(self, name):
+        stack = self.__stack()
+        span = Span(name, len(stack))
+
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            current, peak = tracemalloc.get_traced_memory()
+            # resetting the peak would hide it from the open spans
+            for s in stack:
+                s.mem_peak_abs = max(s.mem_peak_abs, peak)
+            tracemalloc.reset_peak()
+            span.mem_start = current
+            span.mem_peak_abs = current
+
+        # one profiler at a time, nested stages are inside the outer one
+        if self.profile and not self.__profiling:
+            self.__profiling = True
+            span.profile = cProfile.Profile()
+            span.profile.enable()
+
+        stack.append(span)
+        span.start = perf_counter()
+        return span
+
+    def end(self, span):
+        span.end = perf_counter()
+        stack = self.__stack()
+        if span in stack:
+            while stack.pop() is not span:
+                pass
+
+        if isinstance(span.profile, cProfile.Profile):
+            span.profile.disable()
+            out = io.StringIO()
+            stats = pstats.Stats(span.profile, stream=out)
+            stats.sort_stats('cumulative').print_stats(self.profile_lines)
+            span.profile = out.getvalue()
+            self.__profiling = False
+
+        if self.memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            span.mem_peak_abs = max(span.mem_peak_abs, peak)
+            span.peak_mem = span.mem_peak_abs - span.mem_start
+            if stack:
+                stack[-1].mem_peak_abs = max(stack[-1].mem_peak_abs, span.mem_peak_abs)
+
+        with self.__lock:
+            self.spans.append(span)
+
+    def span(self, name):
+        return _SpanContext(self, name)
+
+    def count(self, what, n=1):
+        '''Add to an item count of the innermost open span'''
+        stack = getattr(self.__local, 'stack', None)
+        if stack:
+            stack[-1].count(what, n)
+
+    def clear(self):
+        with self.__lock:
+            self.spans.clear()
+        self.t0 = perf_counter()
+
+    def set_memory(self, on):
+        self.memory = on
+        if not on and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    ##########################################################################
+    # output
+    ##########################################################################
+    def finished(self):
+        with self.__lock:
+            return sorted(self.spans, key=lambda s: s.start)
+
+    def report(self):
+        '''Text report, one line per span, nested spans indented'''
+        lines = []
+        lines.append(f'{"stage":40s} {"time":>10s} {"peak mem":>10s}  items')
+        for s in self.finished():
+            name = '  '*s.depth + s.name
+            mem = '' if s.peak_mem == None else f'{s.peak_mem/1048576.0:7.2f} MB'
+            items = '  '.join(f'{k}={v}' for k, v in s.items.items())
+            lines.append(f'{name:40s} {fmt_seconds(s.elapsed):>10s} {mem:>10s}  {items}')
+        return lines
+
+    def profiles(self):
+        lines = []
+        for s in self.finished():
+            if s.profile != None:
+                lines.append(f'==== {s.name}  {fmt_seconds(s.elapsed)} ====')
+                lines.extend(s.profile.split('\n'))
+        return lines
+
+    def to_json(self):
+        return {'spans': [s.as_dict(self.t0) for s in self.finished()]}
+
+    def to_chrome_trace(self):
+        pid = os.getpid()
+        events = []
+        for s in self.finished():
+            args = dict(s.items)
+            if s.peak_mem != None:
+                args['peak_mem'] = s.peak_mem
+            events.append({'name': s.name,
+                           'cat': s.name.split('.')[0],
+                           'ph': 'X',
+                           'ts': (s.start - self.t0)*1e6,
+                           'dur': s.elapsed*1e6,
+                           'pid': pid,
+                           'tid': s.thread,
+                           'args': args})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save_json(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.to_json(), f, indent=1)
+
+    def save_chrome_trace(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.to_chrome_trace(), f)
+
+
+class _SpanContext:
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+        self.span = None
+
+    def __enter__(self):
+        if self.timer.enabled:
+            self.span = self.timer.begin(self.name)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.span != None:
+            if exc_type != None:
+                self.span.items['error'] = exc_type.__name__
+            self.timer.end(self.span)
+        return False
+
+
+def fmt_seconds(t):
+    if t < 1e-3:
+        return f'{t*1e6:.0f} us'
+    if t < 1.0:
+        return f'{t*1e3:.1f} ms'
+    return f'{t:.2f} s'
+
+
+TIMER = StageTimer()
+
+
+def timed(name=None):
+    '''Decorator that runs a function inside a TIMER span'''
+    def wrap(fn):
+        label = name if name != None else fn.__qualname__
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not TIMER.enabled:
+                return fn(*args, **kwargs)
+            with TIMER.span(label):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
@@ -45,6 +45,7 @@ except:
 #### Subprocess timout stuff ######
 from subprocess import Popen, PIPE
 from threading import Timer
+from stage_timer import TIMER, timed
 def run_external(cmd, timeout_sec):
     stdout=None
     stderr=None
@@ -165,6 +166,7 @@ class SVG_READER(inkex.Effect):
         self.txt2paths = False
         self.CSS_values = CSS_values_class()
 
+    @timed('svg.parse_svg')
     def parse_svg(self,filename):
         try:
             self.parse(filename)
@@ -818,6 +820,7 @@ class SVG_READER(inkex.Effect):
         self.document.getroot().set('viewBox', '%f %f %f %f' %(viewbox[0],viewbox[1],viewbox[2],viewbox[3]))
 
 
+    @timed('svg.make_paths')
     def make_paths(self, txt2paths=False ):
         self.txt2paths = txt2paths
         msg               = ""
@@ -890,6 +893,8 @@ class SVG_READER(inkex.Effect):
                           [0.0  , -scale_h, h_mm+Dy]]]
 
         self.process_group(self.document.getroot())
+        TIMER.count('svg_paths', len(self.Cut_Type))
+        TIMER.count('svg_lines', len(self.lines))
 
 
         #################################################
@@ -33,6 +33,11 @@ import queue
 from dataclasses import dataclass, field
 from typing import Any
 from g_code_inc_library import G_Code_Rip_Inc
+from arc_flatten import arc_sweep
+from stage_timer import TIMER, timed
+from k40_log import get_logger, TRACE, DEBUG
+
+log = get_logger('xtool')
 
 #from flask import Flask
 
@@ -60,6 +65,7 @@ class xtool_CLASS:
 
         self.flipy = True
         self.dialect = 'ecoord'
+        self.native_arcs = True   # G2/G3 are sent as is, not as chords
         self.state = 0
 
         self.linear_rapid = 3000/60  # mm/s
@@ -344,11 +350,12 @@ class xtool_CLASS:
 
         if self.online_status == False:
             d['result'] = 'offline' 
-            print(f'INFO: Machine is offline. not sending: {s}')
+            log.debug('machine is offline, not sending: %s', s)
             return d
 
+        debug = log.isEnabledFor(DEBUG)
         for x in s:
-            print(x);
+            TRACE.add('xtool', x)
             #  /cmd?cmd=
 
             #if x.find('/cmd?cmd=', 0, 7) == 0:
@@ -357,11 +364,12 @@ class xtool_CLASS:
                 #print(f'  {gcode:60s}')
                 self.gparser.line(gcode)
                 #print(self.gparser.get_pos('mm'))
-                gx, gy = self.gparser.get_pos('mm')
-                if not isinstance(x, complex): print(f'  {gcode:60s}        gcode loc = {gx,gy}')
+                if debug:
+                    gx, gy = self.gparser.get_pos('mm')
+                    log.debug('%-60s gcode loc = %s', gcode, (gx, gy))
 
             if self.simulate:
-                print(f'simulate: {x}')
+                log.info('simulate: %s', x)
                 pass
             else:
                 replystr = self._get_request(x, timeout=timeout).decode('utf-8')
@@ -370,7 +378,7 @@ class xtool_CLASS:
                 #print(r)
 
 
-            print(f' blast: r = {r}')
+            if debug: log.debug('blast: %s -> %s', x, r)
             d = d | r
 
             if 'working' in d:
@@ -380,8 +388,7 @@ class xtool_CLASS:
                 self.__status = d['status']
 
             if expect != '?' and d['result'] != expect:
-                msg = f"unexpected result from device: {d}"
-                print(msg)
+                log.warning('unexpected result from device: %s', d)
                 #raise Exception(msg)
 
         return d
@@ -394,6 +401,7 @@ class xtool_CLASS:
         else:
             if port is None: port = self.PORT
             url = f'http://{self.IP}:{port}{path}'
+            TIMER.count('http_requests')
             #print('url: ' + url)
             self.__lasturl = url
             result = requests.get(url, timeout=timeout, **kwargs)
@@ -450,6 +458,7 @@ class xtool_CLASS:
             )
 
 
+    @timed('xtool.upload_gc_file')
     def upload_gc_file(self, gc, update_gui=None, stop_calc=None, passes=1, preprocess_crc=True, wait_for_laser=False, filetype='cut'):
         if update_gui == None:
             update_gui = self.none_function
@@ -478,6 +487,8 @@ class xtool_CLASS:
             print(f'upload_gc_file: {url}')
             print(f'upload_gc_file: {files}')
 
+        TIMER.count('http_requests')
+        TIMER.count('bytes', len(gc))
         result = requests.post(url, files=files)
 
         if self.debug:
@@ -502,8 +513,9 @@ class xtool_CLASS:
 
 
 
+    @timed('xtool.send_data')
     def send_data(self, data, update_gui=None, stop_calc=None, passes=1, preprocess_crc=True, wait_for_laser=False):
-        print("xtool send_data entering")
+        log.info('send_data entering')
         self.paused = False;
         self.sendi = 0;
 
@@ -539,13 +551,15 @@ class xtool_CLASS:
         # to emergency stop
         #
         # do get too far ahead
+        TIMER.count('gcode_lines', len(gcode))
+        debug = log.isEnabledFor(DEBUG)
         for i in range(0, len(gcode)):
            self.blast([f'/cmd?cmd={gcode[i]}'])
            estjobtime = estjobtime + segtime[i][0]
 
            self.sendi = i;
 
-           print(f'{i:5d} of {len(gcode)}    {gcode[i]}')
+           if debug: log.debug('%5d of %d    %s', i, len(gcode), gcode[i])
 
            elapsed = time.time() - self.mark
            self.get_working_state()
@@ -570,7 +584,7 @@ class xtool_CLASS:
                break;
 
            while time.time() < self.mark + estjobtime:
-               print(f'wait for machine {self.mark + estjobtime - time.time():6.3f} sec before next code')
+               if debug: log.debug('wait for machine %6.3f sec before next code', self.mark + estjobtime - time.time())
                time.sleep(0.110)
 
            self.__drlocx = x0 + segtime[i][4]
@@ -582,7 +596,7 @@ class xtool_CLASS:
 
         NoSleep.inhibit()
 
-        print("xtool send_data returning")
+        log.info('send_data returning')
         return 
 
 
@@ -749,7 +763,9 @@ class xtool_CLASS:
         self.blast(s)
         self.lock.release()
 
+    @timed('xtool.ecoord_to_gcode')
     def ecoord_to_gcode(self, data):
+         TIMER.count('ecoords', len(data))
          gcode=[]
          segtime=[]
          scale = 25.4
@@ -799,6 +815,13 @@ class xtool_CLASS:
               dx = x - lastx
               dy = y - lasty
               dist = math.sqrt(dx*dx + dy*dy)
+              arc = len(data[i]) > 7 and loop == lastloop
+              if arc:
+                  # centre relative to the start for I and J
+                  ci = data[i][5] * scale - lastx
+                  cj = data[i][6] * scale - lasty
+                  radius, start, sweep = arc_sweep(lastx, lasty, x, y, lastx+ci, lasty+cj, data[i][7] == 3)
+                  dist = radius * abs(sweep)
               lastx = x
               lasty = y
 
@@ -819,7 +842,10 @@ class xtool_CLASS:
                      segtime.append(0)
                      ledon = True
 
-                  gc = f'G1 X{x:0.3f} Y{y:0.3f}'
+                  if arc:
+                      gc = f'G{data[i][7]} X{x:0.3f} Y{y:0.3f} I{ci:0.3f} J{cj:0.3f}'
+                  else:
+                      gc = f'G1 X{x:0.3f} Y{y:0.3f}'
 
                   if feed != current_feed:
                      gc = gc + f' F{feed:.0f}'
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+'''
+Round trips through the EGV encoder and egv_decode
+
+Run from the repository root with
+
+    python -m pytest test
+'''
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from egv import egv
+from egv_decode import decode_egv
+
+
+def raster_ecoords(rows=5, runs=3, step=0.01):
+    # scan lines with a few separate laser on runs each, as make_raster_coords makes them
+    ecoords = []
+    loop = 0
+    for i in range(rows):
+        y = 1.0 - step*i
+        for k in range(runs):
+            loop = loop + 1
+            ecoords.append([0.1 + 0.2*k, y, loop])
+            ecoords.append([0.2 + 0.2*k, y, loop])
+    return ecoords
+
+
+def encode(ecoords, strip_redundant, Raster_step=10):
+    data = []
+    egv(target=data.append, strip_redundant=strip_redundant).make_egv_data(
+        ecoords, startX=0, startY=0, Feed=100, Raster_step=Raster_step)
+    return bytes(data)
+
+
+def runs(ecoords):
+    # (y, xmin, xmax) of each loop, in inches rounded to a mil
+    loops = {}
+    for x, y, loop, feed, power in ecoords:
+        loops.setdefault(loop, []).append((round(x, 3), round(y, 3)))
+    return [(pts[0][1], min(p[0] for p in pts), max(p[0] for p in pts))
+            for loop, pts in sorted(loops.items())]
+
+
+def test_stripped_raster_round_trip():
+    ecoords = raster_ecoords()
+    data = encode(ecoords, strip_redundant=True)
+    decoded, decoder = decode_egv(data)
+
+    assert decoder.loops == 15
+    found = runs(decoded)
+    rows = sorted(set(r[0] for r in found), reverse=True)
+    assert len(rows) == 5
+    for y in rows:
+        row = sorted((r[1], r[2]) for r in found if r[0] == y)
+        assert len(row) == 3
+        for (x0, x1), k in zip(row, range(3)):
+            assert abs((x1 - x0) - 0.1) < 0.0015
+            assert abs((x0 - row[0][0]) - 0.2*k) < 0.0015
+
+
+def test_stripped_matches_unstripped():
+    ecoords = raster_ecoords()
+    plain, plain_decoder = decode_egv(encode(ecoords, strip_redundant=False))
+    stripped, stripped_decoder = decode_egv(encode(ecoords, strip_redundant=True))
+
+    assert stripped == plain
+    assert stripped_decoder.cut_length == plain_decoder.cut_length
+    assert abs(stripped_decoder.move_length - plain_decoder.move_length) < 1e-9